@@ -99,17 +99,39 @@ def render_chat_ui():
 
             assistant_response = response_data["answer"]
             sources = response_data.get("sources", [])
+            index_status = response_data.get("index_status")
+            failed_papers = response_data.get("failed_papers")
 
         except RoutingException as e:
             logger.error(str(e))
             assistant_response = f"⚠️ {str(e)}"
             sources = []
+            index_status = None
+            failed_papers = None
 
         memory.add_assistant_message(assistant_response)
 
         with st.chat_message("assistant"):
             st.markdown(assistant_response)
 
+            if index_status and index_status["state"] in ("loading", "partial"):
+                st.caption(
+                    f"⏳ Answered while indexing is in progress "
+                    f"({index_status['chunks_indexed']} chunks searched so far)"
+                )
+
+            if index_status and index_status["state"] == "failed":
+                st.caption(
+                    f"⚠️ Indexing stopped ({index_status['error']}), so this answer "
+                    f"may be missing some files; they are indexed again on the next question."
+                )
+
+            if failed_papers:
+                st.caption(
+                    "⚠️ Not included (could not be fetched): "
+                    + ", ".join(failed_papers)
+                )
+
             if sources:
                 st.markdown("---")
                 st.markdown("### 📚 Sources")
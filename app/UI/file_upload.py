@@ -35,7 +35,3 @@ def render_file_upload():
         st.markdown("#### ✅ Uploaded Files")
         for f in st.session_state.uploaded_files:
             st.write(f"- {f['name']}")
-            
-    # Invalidate retriever if new files uploaded
-    if "document_retriever" in st.session_state:
-        del st.session_state["document_retriever"]
@@ -93,22 +93,58 @@ def render_sidebar():
                     for f in uploaded_files:
                         st.write(f"• {f.name}")
 
+                # Optional: restrict answers to some of the files
+                selected_sources = st.multiselect(
+                    "Search only in",
+                    options=[f.name for f in uploaded_files],
+                    help="Leave empty to search all uploaded files"
+                )
+
+                st.session_state["document_filters"] = (
+                    {"sources": selected_sources} if selected_sources else None
+                )
+
+            # Background indexing status (see ingest.IngestJob)
+            ingest_job = st.session_state.get("document_ingest")
+
+            if ingest_job is not None:
+                progress = ingest_job.progress()
+                total = progress["documents_total"] or 1
+
+                if progress["state"] in ("loading", "partial"):
+                    st.progress(
+                        min(progress["documents_loaded"] / total, 1.0),
+                        text=(
+                            f"Indexing: {progress['documents_loaded']}/{total} files, "
+                            f"{progress['chunks_indexed']} chunks searchable"
+                        )
+                    )
+                    st.button("🔄 Refresh status")
+                elif progress["state"] == "failed":
+                    st.error(f"Indexing stopped: {progress['error']}")
+
         # -------------------------------
         # arXiv Paper Section
         # -------------------------------
 
         if selected_mode == "arxiv":
 
-            st.markdown("### 📚 arXiv Paper")
+            st.markdown("### 📚 arXiv Papers")
 
             arxiv_id = st.text_input(
-                "Enter arXiv Paper ID",
-                placeholder="e.g., 1706.03762"
+                "Enter arXiv Paper ID(s)",
+                placeholder="e.g., 1706.03762, 1810.04805",
+                help="Separate several IDs with commas to ask across papers"
             )
 
             if arxiv_id:
                 st.session_state["arxiv_id"] = arxiv_id.strip()
-                st.info(f"Paper ID set: {arxiv_id}")
+                paper_ids = [part.strip() for part in arxiv_id.split(",") if part.strip()]
+
+                if len(paper_ids) > 1:
+                    st.info(f"{len(paper_ids)} papers set: {', '.join(paper_ids)}")
+                else:
+                    st.info(f"Paper ID set: {arxiv_id}")
 
         # -------------------------------
         # Web Mode Info
@@ -0,0 +1,344 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# encode() kwargs that do not change the returned vectors
+_CACHE_SAFE_KWARGS = {"batch_size", "show_progress_bar"}
+
+_SQLITE_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used both as the cache key and as the encoded text.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class CachedEmbeddingModel:
+    """
+    Content-addressed cache in front of SentenceTransformer.encode.
+
+    Vectors are keyed by sha256(model name + normalized text), looked up
+    in an in-memory LRU first and an optional SQLite file second. Only
+    misses are sent to the model. The wrapper forwards every other
+    attribute to the wrapped model, so it is a drop-in replacement.
+
+    Disk rows record when they were last written or read from disk;
+    once the stored vectors exceed `disk_max_bytes` the least recently
+    used rows are deleted.
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        memory_items: int = 50000,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 1 << 30,
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if disk_path:
+            self._db = _open_db(disk_path)
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(length(key) + length(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+
+            with self._lock:
+                self._evict_disk()
+                self._db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    # -----------------------------
+    # Encoding
+    # -----------------------------
+
+    def encode(self, sentences, **kwargs):
+        """
+        Same contract as SentenceTransformer.encode for str / list input
+        returning NumPy arrays.
+        """
+
+        if set(kwargs) - _CACHE_SAFE_KWARGS:
+            return self.model.encode(sentences, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts = [normalize_text(t) for t in ([sentences] if single else sentences)]
+
+        embeddings = self.encode_normalized(texts, **kwargs)
+        return embeddings[0] if single else embeddings
+
+    def encode_normalized(self, texts: List[str], **kwargs) -> np.ndarray:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+
+        # Encode each distinct missing text once
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            started = time.perf_counter()
+            vectors = np.asarray(
+                self.model.encode(list(missing.values()), **kwargs),
+                dtype=np.float32
+            )
+            elapsed = time.perf_counter() - started
+
+            new_entries = dict(zip(missing.keys(), vectors))
+            self._store(new_entries)
+            found.update(new_entries)
+
+            with self._lock:
+                self.misses += len(missing)
+                self.encode_seconds += elapsed
+
+        logger.info(
+            f"Embedding cache: {len(texts) - len(missing)} hits, "
+            f"{len(missing)} misses"
+        )
+
+        dim = self.get_sentence_embedding_dimension()
+        if not keys:
+            return np.empty((0, dim), dtype=np.float32)
+
+        return np.stack([found[key] for key in keys])
+
+    def split_cached(self, texts: List[str]):
+        """
+        Partitions normalized texts into cache hits and misses.
+        Returns (hit_positions, hit_vectors, miss_positions).
+        """
+
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+
+        hits = [i for i, key in enumerate(keys) if key in found]
+        misses = [i for i, key in enumerate(keys) if key not in found]
+
+        dim = self.get_sentence_embedding_dimension()
+        vectors = (
+            np.stack([found[keys[i]] for i in hits])
+            if hits else np.empty((0, dim), dtype=np.float32)
+        )
+
+        with self._lock:
+            self.misses += len(set(keys[i] for i in misses))
+
+        return (
+            np.asarray(hits, dtype=np.int64),
+            vectors,
+            np.asarray(misses, dtype=np.int64),
+        )
+
+    def remember(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Stores vectors encoded elsewhere (e.g. by a worker pool).
+        """
+        self._store({
+            self._key(text): np.asarray(vector, dtype=np.float32)
+            for text, vector in zip(texts, vectors)
+        })
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    # -----------------------------
+    # Cache tiers
+    # -----------------------------
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+        remaining = [key for key in dict.fromkeys(keys) if key not in found]
+
+        if remaining and self._db is not None:
+            from_disk = self._read_disk(remaining)
+            found.update(from_disk)
+
+            with self._lock:
+                self.disk_hits += len(from_disk)
+                self._remember(from_disk)
+
+        return found
+
+    def _store(self, entries: Dict[bytes, np.ndarray]) -> None:
+        with self._lock:
+            self._remember(entries)
+
+            if self._db is not None:
+                now = time.time()
+                for key, vector in entries.items():
+                    blob = vector.tobytes()
+                    inserted = self._db.execute(
+                        "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                        (key, blob, now)
+                    ).rowcount
+                    self._disk_bytes += inserted * (len(key) + len(blob))
+
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, entries: Dict[bytes, np.ndarray]) -> None:
+        """
+        Inserts into the LRU tier. Caller holds the lock.
+        """
+
+        for key, vector in entries.items():
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        now = time.time()
+
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+                if rows:
+                    self._db.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [now, *batch]
+                    )
+
+            if found:
+                self._db.commit()
+
+        return found
+
+    def _evict_disk(self) -> None:
+        """
+        Deletes least recently used disk rows until within budget.
+        Caller holds the lock and commits.
+        """
+
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+
+        evicted = 0
+        while self._disk_bytes > self.disk_max_bytes:
+            rows = self._db.execute(
+                "SELECT key, length(key) + length(vector) FROM embeddings "
+                "ORDER BY last_used LIMIT ?",
+                (_SQLITE_BATCH,)
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+
+            doomed = []
+            for key, size in rows:
+                if self._disk_bytes <= self.disk_max_bytes:
+                    break
+                doomed.append(key)
+                self._disk_bytes -= size
+
+            placeholders = ",".join("?" * len(doomed))
+            self._db.execute(f"DELETE FROM embeddings WHERE key IN ({placeholders})", doomed)
+            evicted += len(doomed)
+
+        logger.info(f"Evicted {evicted} embeddings from the disk cache")
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+
+    def stats(self) -> Dict:
+        """
+        Hit rates and the encode time saved, estimated from the mean
+        per-text encode time of the misses.
+        """
+
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        per_text = self.encode_seconds / self.misses if self.misses else 0.0
+
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "encode_seconds": self.encode_seconds,
+            "estimated_seconds_saved": hits * per_text,
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+        }
+
+
+def _open_db(disk_path: str) -> sqlite3.Connection:
+    path = Path(disk_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    db = sqlite3.connect(str(path), check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+    )
+
+    # Caches written before eviction existed have no last_used column
+    columns = {row[1] for row in db.execute("PRAGMA table_info(embeddings)")}
+    if "last_used" not in columns:
+        db.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+    )
+    db.commit()
+
+    logger.info(f"Embedding disk cache opened at {path}")
+    return db
@@ -0,0 +1,188 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from app.utils.logger import get_logger
+from app.llm.embedding_cache import CachedEmbeddingModel, normalize_text
+
+logger = get_logger(__name__)
+
+_pools: Dict[Tuple[int, int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+_worker_model = None
+
+
+class EmbeddingPipeline:
+    """
+    Batched embedding with length-sorted batches and an optional
+    multi-process encode pool.
+
+    Texts are ordered by length before batching, so each batch pads to
+    a similar sequence length. iter_batches() yields (positions,
+    embeddings) as each batch finishes, letting callers stream rows into
+    the vector store instead of waiting for the whole corpus.
+    """
+
+    def __init__(
+        self,
+        model,
+        batch_size: int = 64,
+        sort_by_length: bool = True,
+        workers: int = 0,
+        min_parallel_chunks: int = 2048,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.workers = workers
+        self.min_parallel_chunks = min_parallel_chunks
+
+        self.last_stats: Dict = {}
+
+    def iter_batches(self, texts: List[str]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yields (positions into `texts`, embeddings) per finished batch.
+        Batches may arrive out of order when a worker pool is used.
+        """
+
+        started = time.perf_counter()
+        embedded = 0
+
+        if self.sort_by_length:
+            order = np.argsort([len(text) for text in texts], kind="stable")
+        else:
+            order = np.arange(len(texts))
+
+        batches = [
+            order[start:start + self.batch_size]
+            for start in range(0, len(order), self.batch_size)
+        ]
+
+        if self.workers > 1 and len(texts) >= self.min_parallel_chunks:
+            batch_iter = self._encode_parallel(texts, batches)
+        else:
+            batch_iter = self._encode_serial(texts, batches)
+
+        for positions, embeddings in batch_iter:
+            embedded += len(positions)
+            yield positions, embeddings
+
+        elapsed = time.perf_counter() - started
+        self.last_stats = {
+            "chunks": embedded,
+            "seconds": elapsed,
+            "chunks_per_second": embedded / elapsed if elapsed else 0.0,
+        }
+
+        logger.info(
+            f"Embedded {embedded} chunks in {elapsed:.2f}s "
+            f"({self.last_stats['chunks_per_second']:.1f} chunks/s)"
+        )
+
+    # -----------------------------
+    # Execution
+    # -----------------------------
+
+    def _encode_serial(self, texts: List[str], batches: List[np.ndarray]):
+        for positions in batches:
+            embeddings = self.model.encode(
+                [texts[i] for i in positions],
+                batch_size=len(positions),
+                show_progress_bar=False,
+            )
+            yield positions, np.asarray(embeddings, dtype=np.float32)
+
+    def _encode_parallel(self, texts: List[str], batches: List[np.ndarray]):
+        """
+        Cache hits are served in-process; only misses go to the pool,
+        and their vectors are written back to the cache.
+        """
+
+        cache = self.model if isinstance(self.model, CachedEmbeddingModel) else None
+        raw_model = cache.model if cache else self.model
+
+        if cache is not None:
+            texts = [normalize_text(text) for text in texts]
+            hit_positions, hit_vectors, miss_positions = cache.split_cached(texts)
+
+            if len(hit_positions):
+                yield hit_positions, hit_vectors
+
+            miss_set = set(miss_positions.tolist())
+            batches = [
+                np.asarray([i for i in batch if i in miss_set], dtype=np.int64)
+                for batch in batches
+            ]
+            batches = [batch for batch in batches if len(batch)]
+
+        pool = _get_pool(raw_model, self.workers)
+
+        futures = {
+            pool.submit(_encode_in_worker, [texts[i] for i in positions]): positions
+            for positions in batches
+        }
+
+        for future in as_completed(futures):
+            positions = futures[future]
+            embeddings = future.result()
+
+            if cache is not None:
+                cache.remember([texts[i] for i in positions], embeddings)
+
+            yield positions, embeddings
+
+
+# -----------------------------
+# Worker pool
+# -----------------------------
+
+def _get_pool(model, workers: int) -> ProcessPoolExecutor:
+    """
+    One long-lived pool per (model, size); the model is shipped to each
+    worker once, at start-up.
+    """
+
+    key = (id(model), workers)
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            logger.info(f"Starting embedding pool with {workers} workers")
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model, max(1, (os.cpu_count() or 1) // workers)),
+            )
+            _pools[key] = pool
+
+    return pool
+
+
+def _init_worker(model, threads: int) -> None:
+    global _worker_model
+
+    import torch
+    torch.set_num_threads(threads)
+
+    _worker_model = model
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return np.asarray(
+        _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+
+@atexit.register
+def _shutdown_pools() -> None:
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,9 +1,29 @@
+from typing import Dict, Optional
+
 from sentence_transformers import SentenceTransformer
 from app.utils.logger import get_logger
+from app.llm.embedding_cache import CachedEmbeddingModel
 
 logger = get_logger(__name__)
 
 
-def load_embedding_model(model_name: str):
+def load_embedding_model(model_name: str, cache_config: Optional[Dict] = None):
+    """
+    Loads a SentenceTransformer, wrapped in a CachedEmbeddingModel when
+    `cache_config` is enabled.
+    """
+
     logger.info(f"Loading HuggingFace embedding model: {model_name}")
-    return SentenceTransformer(model_name)
+    model = SentenceTransformer(model_name)
+
+    cache_config = cache_config or {}
+    if not cache_config.get("enabled", False):
+        return model
+
+    return CachedEmbeddingModel(
+        model,
+        model_name=model_name,
+        memory_items=cache_config.get("memory_items", 50000),
+        disk_path=cache_config.get("disk_path"),
+        disk_max_bytes=int(cache_config.get("max_size_mb", 1024)) * 2**20,
+    )
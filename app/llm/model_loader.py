@@ -1,6 +1,11 @@
+import json
 import requests
+from functools import lru_cache
+from http.cookiejar import DefaultCookiePolicy
 from typing import Generator
 
+from requests.adapters import HTTPAdapter
+
 from app.utils.logger import get_logger
 from app.utils.retry import retry
 from app.exceptions import LLMException
@@ -12,6 +17,8 @@ class OllamaLLM:
     """
     Production-ready wrapper for Ollama LLM API.
     Includes retry logic, timeout protection, and streaming support.
+    Requests go over a process-wide keep-alive session holding up to
+    `pool_size` connections, so turns reuse open connections.
     """
 
     def __init__(
@@ -19,10 +26,12 @@ class OllamaLLM:
         model_name: str = "llama3",
         base_url: str = "http://localhost:11434/api/generate",
         timeout: int = 60,
+        pool_size: int = 10,
     ):
         self.model_name = model_name
         self.base_url = base_url
         self.timeout = timeout
+        self.session = _pooled_session(pool_size)
 
         logger.info(f"OllamaLLM initialized with model: {self.model_name}")
 
@@ -37,7 +46,7 @@ class OllamaLLM:
         """
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
                 json={
                     "model": self.model_name,
@@ -84,7 +93,8 @@ class OllamaLLM:
         """
 
         try:
-            response = requests.post(
+            # Closing the response hands the connection back to the pool
+            with self.session.post(
                 self.base_url,
                 json={
                     "model": self.model_name,
@@ -94,20 +104,19 @@ class OllamaLLM:
                 },
                 stream=True,
                 timeout=self.timeout,
-            )
+            ) as response:
 
-            response.raise_for_status()
+                response.raise_for_status()
 
-            for line in response.iter_lines():
-                if line:
-                    data = line.decode("utf-8")
-                    try:
-                        json_data = eval(data)  # Ollama streams JSON lines
-                        token = json_data.get("response", "")
-                        if token:
-                            yield token
-                    except Exception:
-                        continue
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            json_data = json.loads(line)  # Ollama streams JSON lines
+                            token = json_data.get("response", "")
+                            if token:
+                                yield token
+                        except ValueError:
+                            continue
 
         except requests.Timeout as e:
             logger.error("Ollama streaming request timed out")
@@ -125,8 +134,38 @@ class OllamaLLM:
 # Factory Loader
 # -----------------------------
 
-def load_llm(model_name: str = "llama3") -> OllamaLLM:
+@lru_cache(maxsize=None)
+def load_llm(
+    model_name: str = "llama3",
+    base_url: str = "http://localhost:11434/api/generate",
+    timeout: int = 60,
+    pool_size: int = 10,
+) -> OllamaLLM:
+    """
+    Factory function to load Ollama LLM. Returns one shared instance
+    per settings.
+    """
+    return OllamaLLM(
+        model_name=model_name,
+        base_url=base_url,
+        timeout=timeout,
+        pool_size=pool_size,
+    )
+
+
+@lru_cache(maxsize=None)
+def _pooled_session(pool_size: int) -> requests.Session:
     """
-    Factory function to load Ollama LLM.
+    One keep-alive session per pool size, shared by all threads. The
+    connection pool is thread-safe; cookies, the only state a session
+    mutates per response, are refused.
     """
-    return OllamaLLM(model_name=model_name)
+
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
@@ -1,5 +1,6 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.utils.logger import get_logger
+from app.utils.text_analyzer import TextAnalyzer, get_analyzer
 
 logger = get_logger(__name__)
 
@@ -10,8 +11,9 @@ class RelevanceFilter:
     This is a lightweight, rule-based version.
     """
 
-    def __init__(self, max_turns: int = 5):
+    def __init__(self, max_turns: int = 5, analyzer: Optional[TextAnalyzer] = None):
         self.max_turns = max_turns
+        self.analyzer = analyzer or get_analyzer()
 
     def filter(
         self,
@@ -27,12 +29,14 @@ class RelevanceFilter:
 
         logger.info("Applying relevance filter on chat history")
 
-        query_keywords = set(query.lower().split())
+        # Term sets are memoized per text, so earlier turns are
+        # not re-tokenized on every new message
+        query_keywords = self.analyzer.term_set(query)
 
         relevant_messages = []
 
         for message in reversed(chat_history):
-            content_words = set(message["content"].lower().split())
+            content_words = self.analyzer.term_set(message["content"])
 
             # Simple keyword overlap check
             if query_keywords & content_words:
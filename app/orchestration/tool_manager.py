@@ -1,28 +1,94 @@
-from typing import Dict, Any
-
-from app.exceptions import RoutingException
+import hashlib
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional
+
+from app.exceptions import RetrievalException, RoutingException, StorageException
 from app.utils.logger import get_logger
+from app.utils.config_loader import ConfigLoader
 
 from app.orchestration.context_builder import build_context
-from app.pipelines.document_rag.loader import load_documents
-from app.pipelines.document_rag.chunker import chunk_documents
-from app.pipelines.document_rag.retriever import DocumentRetriever
+from app.pipelines.document_rag.loader import iter_documents, file_fingerprint
+from app.pipelines.document_rag.chunker import Chunker
+from app.pipelines.document_rag.retriever import (
+    DocumentRetriever,
+    read_snapshot_manifest,
+)
+from app.pipelines.document_rag.ingest import IngestJob, active_job, last_job
+from app.storage.retriever_registry import RetrieverHandle, RetrieverRegistry
+from app.storage.paper_store import get_paper_store
+from app.storage.text_cache import get_text_cache
 from app.llm.embeddings import load_embedding_model
 from app.llm.model_loader import load_llm
 from app.llm.response_generator import generate_response
-from app.pipelines.arxiv_rag.arxiv_fetcher import fetch_arxiv_pdf
-from app.pipelines.document_rag.chunker import chunk_documents
-from app.pipelines.document_rag.retriever import DocumentRetriever
+from app.pipelines.arxiv_rag.arxiv_fetcher import fetch_arxiv_paper
+from app.pipelines.arxiv_rag.multi_fetcher import (
+    ArxivClient,
+    fetch_arxiv_papers,
+    parse_arxiv_ids,
+)
 
 
 logger = get_logger(__name__)
 
+_SPOOL_BLOCK_SIZE = 1 << 20
+
+config_loader = ConfigLoader()
+tool_config = config_loader.load("tool_config.yaml").get("tools", {})
+model_config = config_loader.load("model_config.yaml")
+embedding_config = model_config.get("embeddings", {})
+llm_config = model_config.get("llm", {})
+
 # ✅ Load models ONCE (singleton style)
 embedding_model = load_embedding_model(
-    "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_config.get("model_name", "sentence-transformers/all-MiniLM-L6-v2"),
+    cache_config=embedding_config.get("cache")
+)
+
+# One shared client; its pooled session keeps Ollama connections open
+llm = load_llm(
+    "llama3",
+    base_url=llm_config.get("base_url", "http://localhost:11434/api/generate"),
+    timeout=llm_config.get("timeout", 60),
+    pool_size=llm_config.get("pool_size", 10),
 )
 
-llm = load_llm("llama3")
+document_rag_config = tool_config.get("document_rag", {})
+arxiv_config = tool_config.get("arxiv", {})
+
+# Chunking comes from tool_config.yaml, per pipeline; token units follow
+# the embedding model's tokenizer and max_seq_length
+document_chunker = Chunker.from_config(document_rag_config, embedding_model)
+arxiv_chunker = Chunker.from_config(arxiv_config, embedding_model)
+
+# Page-parallel extraction settings for uploads
+loader_config = document_rag_config.get("loader", {})
+
+# Overlapped load -> chunk -> embed/index stages for uploads
+ingest_config = document_rag_config.get("ingest", {})
+
+# Extracted text by file hash, shared by uploads and arXiv papers
+text_cache = get_text_cache(tool_config.get("text_cache"))
+
+# Downloaded arXiv papers and their indexes, by ID and version
+paper_store = get_paper_store(arxiv_config.get("paper_store"))
+
+# Pooled arXiv HTTP client for multi-paper questions
+arxiv_fetch_config = arxiv_config.get("fetch", {})
+arxiv_client = ArxivClient(
+    api_url=arxiv_fetch_config.get("api_url", "https://export.arxiv.org/api/query"),
+    timeout=arxiv_fetch_config.get("timeout", 30),
+    pool_size=arxiv_fetch_config.get("pool_size", 10),
+)
+
+# ✅ Retrievers are shared across sessions by corpus fingerprint
+retriever_registry = RetrieverRegistry(
+    memory_budget_bytes=int(
+        tool_config.get("retriever_registry", {}).get("memory_budget_mb", 2048)
+    ) * 2**20
+)
 
 
 def execute_tool(routing_payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -51,6 +117,166 @@ def execute_tool(routing_payload: Dict[str, Any]) -> Dict[str, Any]:
     )
 
 
+# -----------------------------
+# Retriever Snapshots
+# -----------------------------
+
+def _snapshot_path(snapshot_dir: Optional[str], key: str) -> Optional[Path]:
+    if not snapshot_dir:
+        return None
+    return Path(snapshot_dir) / key.replace("/", "_")
+
+
+def _settings_tag(chunker: Chunker) -> str:
+    settings = json.dumps(chunker.settings, sort_keys=True)
+    return hashlib.sha256(settings.encode()).hexdigest()[:12]
+
+
+def _documents_fingerprint(file_fingerprints: Dict[str, str]) -> str:
+    """
+    Order-independent hash of the uploaded files' contents and of the
+    chunking settings they are split with.
+    """
+
+    joined = "".join(sorted(file_fingerprints.values()))
+    joined += _settings_tag(document_chunker)
+    return hashlib.sha256(joined.encode()).hexdigest()
+
+
+def _load_snapshot(snapshot_path: Optional[Path]) -> Optional[DocumentRetriever]:
+    if snapshot_path and read_snapshot_manifest(snapshot_path):
+        try:
+            return DocumentRetriever.load(
+                snapshot_path,
+                embedding_model,
+                config=document_rag_config
+            )
+        except StorageException as e:
+            logger.warning(f"Ignoring unusable snapshot {snapshot_path}: {e}")
+
+    return None
+
+
+def _save_snapshot(retriever: DocumentRetriever, snapshot_path: Optional[Path]) -> None:
+    if snapshot_path:
+        try:
+            retriever.save(snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write snapshot {snapshot_path}: {e}")
+
+
+def _load_or_build_retriever(
+    snapshot_path: Optional[Path],
+    build_chunks: Callable[[], Iterable[Dict]],
+    fingerprints: Optional[Dict[str, str]] = None,
+) -> DocumentRetriever:
+    """
+    Opens the snapshot at `snapshot_path` if one exists, otherwise builds
+    the retriever from `build_chunks()` and writes a snapshot for next time.
+    """
+
+    retriever = _load_snapshot(snapshot_path)
+    if retriever is not None:
+        return retriever
+
+    retriever = DocumentRetriever(embedding_model, config=document_rag_config)
+    retriever.add_chunks(build_chunks(), fingerprints=fingerprints)
+
+    _save_snapshot(retriever, snapshot_path)
+
+    return retriever
+
+
+def _load_or_ingest_documents(
+    snapshot_path: Optional[Path],
+    uploaded_files: List[Dict],
+    fingerprints: Dict[str, str],
+) -> DocumentRetriever:
+    """
+    Like _load_or_build_retriever, but a missing index is built by a
+    background IngestJob and returned as soon as its first group is
+    queryable. The snapshot is written once ingestion completes.
+    """
+
+    retriever = _load_snapshot(snapshot_path)
+    if retriever is not None:
+        return retriever
+
+    retriever = DocumentRetriever(embedding_model, config=document_rag_config)
+
+    def finished(job: IngestJob) -> None:
+        _save_snapshot(retriever, snapshot_path)
+        retriever_registry.refresh(retriever)
+
+    _start_ingest(
+        retriever,
+        uploaded_files,
+        fingerprints,
+        on_complete=finished,
+        on_failed=_mark_stale,
+    )
+
+    return retriever
+
+
+def _mark_stale(job: IngestJob) -> None:
+    """
+    A failed ingestion leaves the retriever short of its fingerprint's
+    files; the registry re-ingests them on the next question.
+    """
+    retriever_registry.mark_stale(job.retriever)
+
+
+def _start_ingest(
+    retriever: DocumentRetriever,
+    uploaded_files: List[Dict],
+    fingerprints: Dict[str, str],
+    on_complete: Optional[Callable[[IngestJob], None]] = None,
+    on_failed: Optional[Callable[[IngestJob], None]] = None,
+) -> IngestJob:
+    """
+    Starts ingesting `uploaded_files` into `retriever` and waits for the
+    first indexed group.
+    """
+
+    # The background stages read private copies, since Streamlit keeps
+    # reading (and seeking) the upload objects on every rerun. They are
+    # spooled to anonymous temp files block by block, not held in memory
+    files = []
+    for file_obj in uploaded_files:
+        sha256 = file_fingerprint(file_obj)
+
+        spooled = tempfile.TemporaryFile(prefix="querywave-upload-")
+        file_obj["file"].seek(0)
+        shutil.copyfileobj(file_obj["file"], spooled, _SPOOL_BLOCK_SIZE)
+        file_obj["file"].seek(0)
+        spooled.seek(0)
+
+        files.append({"name": file_obj["name"], "file": spooled, "sha256": sha256})
+
+    def documents() -> Iterator[Dict]:
+        try:
+            yield from _iter_documents(files)
+        finally:
+            for file in files:
+                file["file"].close()
+
+    job = IngestJob(
+        retriever,
+        documents=documents,
+        chunker=document_chunker,
+        fingerprints=fingerprints,
+        total_documents=len(files),
+        queue_size=ingest_config.get("queue_size", 4),
+        group_size=ingest_config.get("group_chunks", 256),
+        on_complete=on_complete,
+        on_failed=on_failed,
+    ).start()
+
+    job.wait_ready(ingest_config.get("ready_timeout"))
+    return job
+
+
 # -----------------------------
 # Document Pipeline
 # -----------------------------
@@ -60,21 +286,45 @@ def _execute_document_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
     state = payload.get("state", {})
     uploaded_files = state.get("uploaded_files", [])
 
-    if "document_retriever" not in state:
-
-        logger.info("Initializing retriever for first time")
+    fingerprints = {
+        file_obj["name"]: file_fingerprint(file_obj)
+        for file_obj in uploaded_files
+    }
 
-        documents = load_documents(uploaded_files)
-        chunks = chunk_documents(documents)
+    corpus_fingerprint = _documents_fingerprint(fingerprints)
+    previous = state.get("document_retriever")
 
-        retriever = DocumentRetriever(embedding_model)
-        retriever.index_chunks(chunks)
+    snapshot_path = _snapshot_path(
+        document_rag_config.get("snapshot_dir"),
+        corpus_fingerprint
+    )
 
-        state["document_retriever"] = retriever
+    state["document_retriever"] = retriever_registry.acquire(
+        f"documents:{corpus_fingerprint}",
+        builder=lambda: _load_or_ingest_documents(
+            snapshot_path,
+            uploaded_files,
+            fingerprints
+        ),
+        previous=previous,
+        update=lambda retriever: _sync_document_retriever(
+            retriever,
+            uploaded_files,
+            fingerprints
+        )
+    )
 
     retriever = state["document_retriever"]
 
-    retrieved_chunks = retriever.retrieve(query, top_k=5)
+    # Indexing may still be running; the UI shows its progress
+    job = last_job(retriever.retriever)
+    state["document_ingest"] = job
+
+    retrieved_chunks = retriever.retrieve(
+        query,
+        top_k=5,
+        filters=state.get("document_filters")
+    )
 
     context = build_context(
         user_query=query,
@@ -91,15 +341,96 @@ def _execute_document_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
         "status": "success",
         "data": {
         "answer": final_answer,
-        "sources": retrieved_chunks
+        "sources": retrieved_chunks,
+        "index_status": job.progress() if job is not None else None
     }
     }
 
+def _iter_documents(uploaded_files: List[Dict]) -> Iterable[Dict]:
+    return iter_documents(
+        uploaded_files,
+        workers=loader_config.get("workers"),
+        pages_per_task=loader_config.get("pages_per_task", 16),
+        min_parallel_pages=loader_config.get("min_parallel_pages", 32),
+        text_cache=text_cache,
+    )
+
+
+def _sync_document_retriever(
+    retriever: DocumentRetriever,
+    uploaded_files: List[Dict],
+    fingerprints: Dict[str, str],
+) -> None:
+    """
+    Brings the retriever in line with the uploaded files: sources that
+    were removed or whose content changed are dropped, and only new or
+    changed files are loaded, chunked and embedded.
+    """
+
+    # One ingestion per retriever at a time
+    running = active_job(retriever)
+    if running is not None:
+        running.wait()
+
+    indexed = retriever.source_fingerprints
+
+    for source, fingerprint in indexed.items():
+        if fingerprints.get(source) != fingerprint:
+            retriever.remove_source(source)
+
+    changed = [
+        file_obj for file_obj in uploaded_files
+        if indexed.get(file_obj["name"]) != fingerprints[file_obj["name"]]
+    ]
+
+    if changed:
+        logger.info(f"Incrementally indexing {len(changed)} changed file(s)")
+        _start_ingest(
+            retriever,
+            changed,
+            fingerprints,
+            on_complete=lambda job: retriever_registry.refresh(retriever),
+            on_failed=_mark_stale,
+        )
+
 # -----------------------------
 # Web Pipeline (placeholder)
 # -----------------------------
 
-from app.pipelines.web_rag.web_search import search_web
+from app.pipelines.web_rag.web_search import build_search_backend
+from app.pipelines.web_rag.search_cache import SearchCache
+from app.pipelines.web_rag.page_fetcher import PageFetcher, fetch_pages
+
+web_search_config = tool_config.get("web_search", {})
+search_cache_config = web_search_config.get("cache", {})
+
+# DuckDuckGo, a local corpus or a recorded fixture (web_search.backend)
+search_backend = build_search_backend(web_search_config, embedding_model)
+
+# Identical / trivially rephrased queries within the TTL share results
+search_cache = (
+    SearchCache(
+        search_backend.search,
+        ttl_seconds=search_cache_config.get("ttl_seconds", 600),
+        memory_items=search_cache_config.get("memory_items", 1024),
+        disk_path=search_cache_config.get("disk_path"),
+    )
+    if search_cache_config.get("enabled", False) else None
+)
+
+# Optional full-page stage: result pages are fetched concurrently and
+# indexed per query, so the prompt gets the best passages, not snippets
+page_config = web_search_config.get("pages", {})
+web_chunker = Chunker.from_config(page_config, embedding_model)
+
+page_fetcher = (
+    PageFetcher(
+        timeout=page_config.get("request_timeout", 5),
+        pool_size=page_config.get("pool_size", 8),
+        max_bytes=int(page_config.get("max_page_kb", 2048)) * 1024,
+    )
+    if page_config.get("enabled", False) else None
+)
 
 
 def _execute_web_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
@@ -109,7 +440,10 @@ def _execute_web_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
     logger.info("Web search pipeline invoked")
 
     # 1️⃣ Get search results
-    search_results = search_web(query, max_results=5)
+    if search_cache is not None:
+        search_results = search_cache.search(query, max_results=5)
+    else:
+        search_results = search_backend.search(query, max_results=5)
 
     if not search_results:
         raise RoutingException(
@@ -118,14 +452,10 @@ def _execute_web_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
         )
 
     # 2️⃣ Convert results to chunks format
-    chunks = []
-
-    for idx, result in enumerate(search_results):
-        chunks.append({
-            "source": result["href"],
-            "chunk_id": idx,
-            "text": f"{result['title']}\n\n{result['body']}"
-        })
+    if page_fetcher is not None:
+        chunks = _web_page_passages(query, search_results)
+    else:
+        chunks = _web_snippet_chunks(search_results)
 
     # 3️⃣ Build context
     context = build_context(
@@ -138,7 +468,6 @@ def _execute_web_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
     )
 
     # 4️⃣ Generate response
-    llm = load_llm("llama3")
     final_answer = generate_response(llm, context)
 
     return {
@@ -149,6 +478,50 @@ def _execute_web_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
         }
     }
 
+
+def _web_snippet_chunks(search_results: List[Dict]) -> List[Dict]:
+
+    return [
+        {
+            "source": result["href"],
+            "chunk_id": idx,
+            "text": f"{result['title']}\n\n{result['body']}"
+        }
+        for idx, result in enumerate(search_results)
+    ]
+
+
+def _web_page_passages(query: str, search_results: List[Dict]) -> List[Dict]:
+    """
+    Fetches the result pages within the configured deadline, indexes
+    them in a throwaway retriever and returns the best passages. Results
+    whose page missed the deadline or failed keep their snippet.
+    """
+
+    # Results without a URL keep their snippet under a synthetic source
+    sources = [result.get("href") or f"web:{idx}" for idx, result in enumerate(search_results)]
+
+    pages = fetch_pages(
+        [result["href"] for result in search_results if result.get("href")],
+        page_fetcher,
+        deadline=page_config.get("deadline", 4),
+        extract_workers=loader_config.get("workers"),
+        min_chars=page_config.get("min_chars", 200),
+    )
+
+    documents = [
+        {
+            "source": source,
+            "text": f"{result.get('title') or ''}\n\n{pages.get(source) or result.get('body') or ''}"
+        }
+        for source, result in zip(sources, search_results)
+    ]
+
+    retriever = DocumentRetriever(embedding_model, page_config.get("retriever"))
+    retriever.add_chunks(web_chunker(documents))
+
+    return retriever.retrieve(query, top_k=page_config.get("top_k", 6))
+
 # -----------------------------
 # arXiv Pipeline (placeholder)
 # -----------------------------
@@ -166,24 +539,31 @@ def _execute_arxiv_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
             error_code="ARXIV_ID_MISSING"
         )
 
-    # Cache per paper
-    cache_key = f"arxiv_retriever_{arxiv_id}"
-
-    if cache_key not in state:
-
-        logger.info(f"Initializing retriever for arXiv paper {arxiv_id}")
+    arxiv_ids = parse_arxiv_ids(arxiv_id, arxiv_fetch_config.get("max_papers", 10))
 
-        paper_text = fetch_arxiv_pdf(arxiv_id)
+    # One handle per session, for the paper set last asked about; the
+    # index itself is shared by every session. Acquiring another set
+    # releases the previous handle's reference.
+    previous = state.get("arxiv_retriever")
+    failed_papers: Dict[str, str] = {}
 
-        documents = [{"source": arxiv_id, "text": paper_text}]
-        chunks = chunk_documents(documents)
+    if previous is not None and state.get("arxiv_retriever_ids") == arxiv_ids:
+        retriever = previous
 
-        retriever = DocumentRetriever(embedding_model)
-        retriever.index_chunks(chunks)
+    else:
+        if len(arxiv_ids) == 1:
+            logger.info(f"Initializing retriever for arXiv paper {arxiv_ids[0]}")
+            retriever = _acquire_arxiv_retriever(arxiv_ids[0], previous=previous)
+        else:
+            logger.info(f"Initializing merged retriever for arXiv papers {arxiv_ids}")
+            retriever, failed_papers = _acquire_merged_arxiv_retriever(
+                arxiv_ids, previous=previous
+            )
 
-        state[cache_key] = retriever
+        state["arxiv_retriever"] = retriever
 
-    retriever = state[cache_key]
+        # Papers that failed are retried on the next question
+        state["arxiv_retriever_ids"] = None if failed_papers else arxiv_ids
 
     retrieved_chunks = retriever.retrieve(query, top_k=5)
 
@@ -202,9 +582,121 @@ def _execute_arxiv_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
         "status": "success",
         "data": {
             "answer": final_answer,
-            "sources": retrieved_chunks
+            "sources": retrieved_chunks,
+            "failed_papers": failed_papers
         }
     }
+
+
+def _acquire_arxiv_retriever(
+    arxiv_id: str,
+    previous: Optional[RetrieverHandle] = None,
+) -> RetrieverHandle:
+    """
+    Shared retriever for one paper. With the paper store enabled, a
+    stored paper (newest version for an unversioned ID) and its index
+    snapshot are used without any network I/O or re-embedding.
+    `previous` is released once the new handle is acquired.
+    """
+
+    tag = _settings_tag(arxiv_chunker)
+    fetched: Dict = {}
+
+    paper_id = paper_store.resolve(arxiv_id) if paper_store is not None else None
+    if paper_id is None and paper_store is not None:
+        fetched = fetch_arxiv_paper(
+            arxiv_id, paper_store, text_cache, timeout=arxiv_client.timeout
+        )
+        paper_id = fetched["arxiv_id"]
+    paper_id = paper_id or arxiv_id
+
+    if paper_store is not None:
+        snapshot_path = paper_store.index_path(paper_id, tag)
+    else:
+        snapshot_path = _snapshot_path(arxiv_config.get("snapshot_dir"), f"{paper_id}-{tag}")
+
+    def build_chunks():
+        paper = fetched or fetch_arxiv_paper(
+            paper_id, paper_store, text_cache, timeout=arxiv_client.timeout
+        )
+        return arxiv_chunker([{
+            "source": paper["arxiv_id"],
+            "text": paper["text"],
+            "page_starts": paper["page_starts"],
+        }])
+
+    def build() -> DocumentRetriever:
+        retriever = _load_or_build_retriever(snapshot_path, build_chunks)
+        if paper_store is not None:
+            paper_store.refresh(paper_id)
+        return retriever
+
+    return retriever_registry.acquire(
+        f"arxiv:{paper_id}-{tag}", builder=build, previous=previous
+    )
+
+
+def _acquire_merged_arxiv_retriever(
+    arxiv_ids: List[str],
+    previous: Optional[RetrieverHandle] = None,
+):
+    """
+    One index over several papers, fetched concurrently; each chunk's
+    source is its paper's versioned ID. Returns (handle, {id: error}
+    for papers that could not be fetched). `previous` is released once
+    the new handle is acquired.
+    """
+
+    papers = fetch_arxiv_papers(
+        arxiv_ids,
+        arxiv_client,
+        paper_store=paper_store,
+        text_cache=text_cache,
+        extract_workers=loader_config.get("workers"),
+    )
+
+    failed = {arxiv_id: paper["error"] for arxiv_id, paper in papers.items() if "error" in paper}
+    fetched = [paper for paper in papers.values() if "error" not in paper]
+
+    if not fetched:
+        raise RetrievalException(
+            message=f"Could not fetch any of the arXiv papers: {failed}",
+            error_code="ARXIV_FETCH_FAILED"
+        )
+
+    paper_ids = sorted(paper["arxiv_id"] for paper in fetched)
+    tag = _settings_tag(arxiv_chunker)
+    index_key = hashlib.sha256(",".join(paper_ids + [tag]).encode()).hexdigest()[:16]
+
+    def build_chunks():
+        return arxiv_chunker(
+            {
+                "source": paper["arxiv_id"],
+                "text": paper["text"],
+                "page_starts": paper["page_starts"],
+            }
+            for paper in fetched
+        )
+
+    # Merged snapshots count against the paper store's budget
+    if paper_store is not None:
+        snapshot_path = paper_store.merged_index_path(index_key)
+    else:
+        snapshot_path = _snapshot_path(arxiv_config.get("snapshot_dir"), f"merged-{index_key}")
+
+    def build() -> DocumentRetriever:
+        retriever = _load_or_build_retriever(snapshot_path, build_chunks)
+        if paper_store is not None:
+            paper_store.track_merged_index(index_key)
+        return retriever
+
+    handle = retriever_registry.acquire(
+        f"arxiv:merged-{index_key}", builder=build, previous=previous
+    )
+
+    return handle, failed
+
+
 from app.memory.chat_history import ChatHistoryManager
 
 def _execute_chat_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
@@ -223,7 +715,6 @@ def _execute_chat_pipeline(query: str, payload: Dict) -> Dict[str, Any]:
         retrieval_data=None
     )
 
-    llm = load_llm("llama3")
     final_answer = generate_response(llm, context)
 
     return {
@@ -1,19 +1,37 @@
 import arxiv
 import requests
-import io
+import hashlib
 import fitz
+from typing import Dict, Optional
 
 from app.utils.logger import get_logger
 from app.exceptions import RetrievalException
+from app.storage.text_cache import TextCache
+from app.storage.paper_store import PaperStore
+from app.pipelines.document_rag.loader import join_pages
 
 logger = get_logger(__name__)
 
 
-def fetch_arxiv_pdf(arxiv_id: str) -> str:
+def fetch_arxiv_paper(
+    arxiv_id: str,
+    paper_store: Optional[PaperStore] = None,
+    text_cache: Optional[TextCache] = None,
+    timeout: float = 30.0,
+) -> Dict:
     """
-    Fetch arXiv paper by ID and return extracted text.
+    Fetch arXiv paper by ID. Returns {"arxiv_id" (versioned), "title",
+    "text", "page_starts"}.
+
+    A paper already in `paper_store` (the newest stored version when
+    `arxiv_id` has none) is read from disk with no network I/O; a
+    downloaded paper is added to the store.
     """
 
+    stored = stored_paper(paper_store, arxiv_id)
+    if stored is not None:
+        return stored
+
     logger.info(f"Fetching arXiv paper: {arxiv_id}")
 
     search = arxiv.Search(id_list=[arxiv_id])
@@ -28,17 +46,31 @@ def fetch_arxiv_pdf(arxiv_id: str) -> str:
     paper = results[0]
     pdf_url = paper.pdf_url
 
-    response = requests.get(pdf_url)
+    try:
+        response = requests.get(pdf_url, timeout=timeout)
+    except requests.RequestException as e:
+        raise RetrievalException(
+            message=f"Failed to download arXiv PDF: {e}",
+            error_code="ARXIV_DOWNLOAD_FAILED"
+        ) from e
+
     if response.status_code != 200:
         raise RetrievalException(
             message="Failed to download arXiv PDF",
             error_code="ARXIV_DOWNLOAD_FAILED"
         )
 
-    pdf_bytes = io.BytesIO(response.content)
+    digest = hashlib.sha256(response.content).hexdigest()
+    cached = text_cache.get(digest) if text_cache is not None else None
+
+    if cached is not None:
+        text, page_starts = cached["text"], cached["page_starts"]
+    else:
+        with fitz.open(stream=response.content, filetype="pdf") as doc:
+            text, page_starts = join_pages(page.get_text() for page in doc)
 
-    with fitz.open(stream=pdf_bytes.read(), filetype="pdf") as doc:
-        text = "\n".join(page.get_text() for page in doc)
+        if text_cache is not None and text.strip():
+            text_cache.put(digest, text, page_starts)
 
     if not text.strip():
         raise RetrievalException(
@@ -46,4 +78,42 @@ def fetch_arxiv_pdf(arxiv_id: str) -> str:
             error_code="ARXIV_EMPTY_TEXT"
         )
 
-    return text
+    # e.g. "1706.03762v7"; the requested ID may not carry a version
+    versioned_id = paper.get_short_id()
+
+    if paper_store is not None:
+        try:
+            versioned_id = paper_store.put_paper(
+                versioned_id, response.content, text, page_starts, title=paper.title
+            )
+        except OSError as e:
+            logger.warning(f"Could not store arXiv paper {versioned_id}: {e}")
+
+    return {
+        "arxiv_id": versioned_id,
+        "title": paper.title,
+        "text": text,
+        "page_starts": page_starts,
+    }
+
+
+def stored_paper(paper_store: Optional[PaperStore], arxiv_id: str) -> Optional[Dict]:
+    """
+    The paper for `arxiv_id` from the local store, or None.
+    """
+
+    if paper_store is None:
+        return None
+
+    key = paper_store.resolve(arxiv_id)
+    stored = paper_store.get_paper(key) if key else None
+    if stored is None:
+        return None
+
+    logger.info(f"Using stored arXiv paper {key}")
+    return {
+        "arxiv_id": key,
+        "title": stored.get("title"),
+        "text": stored["text"],
+        "page_starts": stored.get("page_starts"),
+    }
@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.logger import get_logger
+from app.exceptions import RetrievalException
+from app.storage.paper_store import PaperStore, split_arxiv_id
+from app.storage.text_cache import TextCache
+from app.pipelines.arxiv_rag.arxiv_fetcher import stored_paper
+from app.pipelines.document_rag.loader import (
+    extract_pdf_pages,
+    get_extraction_pool,
+    join_pages,
+)
+
+logger = get_logger(__name__)
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+
+_ID_SEPARATORS = re.compile(r"[\s,;]+")
+
+_DOWNLOAD_BLOCK_SIZE = 1 << 16
+
+
+def parse_arxiv_ids(value: str, max_papers: Optional[int] = None) -> List[str]:
+    """
+    Splits comma/space separated IDs, dropping blanks and repeats.
+    """
+
+    ids = list(dict.fromkeys(part for part in _ID_SEPARATORS.split(value or "") if part))
+
+    if max_papers and len(ids) > max_papers:
+        raise RetrievalException(
+            message=f"At most {max_papers} arXiv papers can be combined, got {len(ids)}",
+            error_code="ARXIV_TOO_MANY_IDS"
+        )
+
+    return ids
+
+
+class ArxivClient:
+    """
+    Blocking arXiv API / PDF client over one pooled, keep-alive
+    requests.Session. Every call is bounded by `timeout` seconds end to
+    end (not only per socket read). `api_url` can point at a local stub
+    server.
+    """
+
+    def __init__(
+        self,
+        api_url: str = "https://export.arxiv.org/api/query",
+        timeout: float = 30.0,
+        pool_size: int = 10,
+    ):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def metadata(self, arxiv_ids: List[str]) -> Dict[str, Dict]:
+        """
+        One API query for all IDs. Returns requested id ->
+        {"arxiv_id" (versioned), "title", "pdf_url"}; IDs arXiv does not
+        know are missing from the result.
+        """
+
+        feed = self._get(
+            self.api_url,
+            params={"id_list": ",".join(arxiv_ids), "max_results": len(arxiv_ids)},
+        )
+
+        try:
+            root = ET.fromstring(feed)
+        except ET.ParseError as e:
+            raise RetrievalException(
+                message=f"Malformed arXiv API response: {e}",
+                error_code="ARXIV_BAD_RESPONSE"
+            ) from e
+
+        by_base: Dict[str, Dict] = {}
+        for entry in root.iter(f"{_ATOM}entry"):
+            entry_id = (entry.findtext(f"{_ATOM}id") or "").strip()
+            if "/abs/" not in entry_id:
+                continue  # error entries carry an API URL instead
+
+            versioned = entry_id.split("/abs/", 1)[1]
+            pdf_url = next(
+                (
+                    link.get("href") for link in entry.iter(f"{_ATOM}link")
+                    if link.get("title") == "pdf"
+                ),
+                None,
+            )
+            title = " ".join((entry.findtext(f"{_ATOM}title") or "").split())
+
+            by_base[split_arxiv_id(versioned)[0]] = {
+                "arxiv_id": versioned,
+                "title": title,
+                "pdf_url": pdf_url,
+            }
+
+        return {
+            arxiv_id: by_base[split_arxiv_id(arxiv_id)[0]]
+            for arxiv_id in arxiv_ids
+            if split_arxiv_id(arxiv_id)[0] in by_base
+        }
+
+    def download(self, url: str) -> bytes:
+        return self._get(url)
+
+    def _get(self, url: str, params: Optional[Dict] = None) -> bytes:
+        deadline = time.monotonic() + self.timeout
+
+        try:
+            with self.session.get(url, params=params, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    raise RetrievalException(
+                        message=f"arXiv request failed with HTTP {response.status_code}: {url}",
+                        error_code="ARXIV_DOWNLOAD_FAILED"
+                    )
+
+                blocks = []
+                for block in response.iter_content(_DOWNLOAD_BLOCK_SIZE):
+                    if time.monotonic() > deadline:
+                        raise RetrievalException(
+                            message=f"arXiv request exceeded {self.timeout}s: {url}",
+                            error_code="ARXIV_TIMEOUT"
+                        )
+                    blocks.append(block)
+
+                return b"".join(blocks)
+
+        except requests.Timeout as e:
+            raise RetrievalException(
+                message=f"arXiv request exceeded {self.timeout}s: {url}",
+                error_code="ARXIV_TIMEOUT"
+            ) from e
+        except requests.RequestException as e:
+            raise RetrievalException(
+                message=f"arXiv request failed: {e}",
+                error_code="ARXIV_DOWNLOAD_FAILED"
+            ) from e
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def fetch_arxiv_papers(
+    arxiv_ids: List[str],
+    client: ArxivClient,
+    paper_store: Optional[PaperStore] = None,
+    text_cache: Optional[TextCache] = None,
+    extract_workers: Optional[int] = None,
+) -> Dict[str, Dict]:
+    """
+    Fetches several papers concurrently. Returns requested id -> paper
+    ({"arxiv_id" (versioned), "title", "text", "page_starts"}) or
+    {"error": message} for a paper that could not be fetched in time.
+
+    Stored papers are read from `paper_store` with no network I/O. The
+    remaining ones share one metadata query, then download in parallel
+    (each bounded by the client timeout) and are extracted on the
+    process pool, so wall-clock time tracks the slowest paper.
+    """
+
+    started = time.perf_counter()
+
+    papers = asyncio.run(
+        _fetch_all(arxiv_ids, client, paper_store, text_cache, extract_workers)
+    )
+
+    failed = [arxiv_id for arxiv_id, paper in papers.items() if "error" in paper]
+    logger.info(
+        f"Fetched {len(papers) - len(failed)}/{len(arxiv_ids)} arXiv papers in "
+        f"{time.perf_counter() - started:.2f}s"
+        + (f"; failed: {', '.join(failed)}" if failed else "")
+    )
+
+    return papers
+
+
+# -----------------------------
+# Async orchestration
+# -----------------------------
+
+async def _fetch_all(
+    arxiv_ids: List[str],
+    client: ArxivClient,
+    paper_store: Optional[PaperStore],
+    text_cache: Optional[TextCache],
+    extract_workers: Optional[int],
+) -> Dict[str, Dict]:
+
+    loop = asyncio.get_running_loop()
+    papers: Dict[str, Dict] = {}
+
+    # Blocking HTTP and disk I/O run on threads, one per pooled connection
+    io_pool = ThreadPoolExecutor(max_workers=client.pool_size, thread_name_prefix="arxiv-io")
+
+    workers = extract_workers if extract_workers is not None else os.cpu_count() or 1
+    extract_pool = get_extraction_pool(workers) if workers > 1 else io_pool
+
+    try:
+        missing = []
+        for arxiv_id in arxiv_ids:
+            stored = stored_paper(paper_store, arxiv_id)
+            if stored is not None:
+                papers[arxiv_id] = stored
+            else:
+                missing.append(arxiv_id)
+
+        if not missing:
+            return papers
+
+        try:
+            metadata = await _bounded(
+                loop.run_in_executor(io_pool, client.metadata, missing), client.timeout
+            )
+        except RetrievalException as e:
+            papers.update({arxiv_id: {"error": str(e)} for arxiv_id in missing})
+            return papers
+
+        async def fetch_one(arxiv_id: str) -> Dict:
+            meta = metadata.get(arxiv_id)
+            if meta is None or not meta["pdf_url"]:
+                return {"error": f"No paper found with ID {arxiv_id}"}
+
+            try:
+                pdf_bytes = await _bounded(
+                    loop.run_in_executor(io_pool, client.download, meta["pdf_url"]),
+                    client.timeout,
+                )
+                text, page_starts = await _extract(
+                    loop, extract_pool, pdf_bytes, text_cache
+                )
+            except Exception as e:
+                logger.warning(f"Could not fetch arXiv paper {arxiv_id}: {e}")
+                return {"error": str(e)}
+
+            paper = {
+                "arxiv_id": meta["arxiv_id"],
+                "title": meta["title"],
+                "text": text,
+                "page_starts": page_starts,
+            }
+
+            if paper_store is not None:
+                try:
+                    paper["arxiv_id"] = await loop.run_in_executor(
+                        io_pool,
+                        lambda: paper_store.put_paper(
+                            meta["arxiv_id"], pdf_bytes, text, page_starts, title=meta["title"]
+                        ),
+                    )
+                except OSError as e:
+                    logger.warning(f"Could not store arXiv paper {meta['arxiv_id']}: {e}")
+
+            return paper
+
+        results = await asyncio.gather(*(fetch_one(arxiv_id) for arxiv_id in missing))
+        papers.update(zip(missing, results))
+
+        return papers
+
+    finally:
+        io_pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _bounded(future, timeout: float):
+    """
+    Awaits `future` with a deadline, surfaced as ARXIV_TIMEOUT.
+    """
+
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError as e:
+        raise RetrievalException(
+            message=f"arXiv request exceeded {timeout}s",
+            error_code="ARXIV_TIMEOUT"
+        ) from e
+
+
+async def _extract(loop, pool, pdf_bytes: bytes, text_cache: Optional[TextCache]):
+    """
+    (text, page_starts) of a PDF, from the text cache or the pool.
+    """
+
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    cached = text_cache.get(digest) if text_cache is not None else None
+    if cached is not None:
+        return cached["text"], cached["page_starts"]
+
+    # Workers open the PDF by path rather than receiving the bytes
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        pages = await loop.run_in_executor(pool, extract_pdf_pages, path)
+    finally:
+        os.unlink(path)
+
+    text, page_starts = join_pages(pages)
+
+    if not text.strip():
+        raise RetrievalException(
+            message="Extracted paper text is empty",
+            error_code="ARXIV_EMPTY_TEXT"
+        )
+
+    if text_cache is not None:
+        text_cache.put(digest, text, page_starts)
+
+    return text, page_starts
+
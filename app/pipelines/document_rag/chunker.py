@@ -1,52 +1,276 @@
-from typing import List, Dict
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from app.utils.logger import get_logger
+from app.exceptions import RetrievalException
 
 logger = get_logger(__name__)
 
+CHUNK_UNITS = ("chars", "tokens")
+
+CHUNK_STRATEGIES = ("fixed", "sentence")
+
+# One sentence per match: up to terminal punctuation (plus closing
+# quotes/brackets) followed by whitespace, a paragraph break, or the end
+_SENTENCE = re.compile(r"\S.*?(?:[.!?][\"')\]]*(?=\s)|(?=\n[ \t]*\n)|$)", re.S)
+
+# [CLS] / [SEP] added by the embedding model around every chunk
+_SPECIAL_TOKENS = 2
+
 
-def chunk_documents(
-    documents: List[Dict],
-    chunk_size: int = 500,
-    chunk_overlap: int = 50
-) -> List[Dict]:
+class Chunker:
     """
-    Splits documents into overlapping text chunks.
-
-    Returns:
-        [
-          {
-            "source": filename,
-            "chunk_id": int,
-            "text": chunk_text
-          }
-        ]
+    Streaming chunker.
+
+    strategy="fixed" cuts fixed windows; strategy="sentence" segments the
+    text into sentences in one regex pass and packs whole sentences up
+    to chunk_size, preferring to end chunks at paragraph breaks, with
+    whole trailing sentences (up to chunk_overlap) repeated as overlap.
+
+    Sizes are measured in characters or, with unit="tokens", in tokens
+    of the embedding model's own tokenizer, capped at the model's
+    max_seq_length so no chunk is silently truncated at encode time.
+    Calling the chunker returns a generator, so chunks can be fed to the
+    embedding batches without building the full list. Documents with
+    "page_starts" (see loader.iter_documents) give every chunk the
+    "page" it starts on.
     """
 
-    chunks = []
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        unit: str = "chars",
+        tokenizer=None,
+        max_tokens: Optional[int] = None,
+        strategy: str = "fixed",
+    ):
+        if strategy not in CHUNK_STRATEGIES:
+            raise RetrievalException(
+                message=f"Unknown chunking strategy '{strategy}', expected one of {CHUNK_STRATEGIES}",
+                error_code="INVALID_CHUNK_CONFIG"
+            )
+
+        if unit not in CHUNK_UNITS:
+            raise RetrievalException(
+                message=f"Unknown chunk unit '{unit}', expected one of {CHUNK_UNITS}",
+                error_code="INVALID_CHUNK_CONFIG"
+            )
 
-    for doc in documents:
-        text = doc["text"]
-        source = doc["source"]
+        if unit == "tokens":
+            if tokenizer is None:
+                raise RetrievalException(
+                    message="Token-based chunking needs the embedding model's tokenizer",
+                    error_code="INVALID_CHUNK_CONFIG"
+                )
+            if max_tokens:
+                chunk_size = min(chunk_size, max_tokens)
 
-        start = 0
-        chunk_id = 0
+        if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+            raise RetrievalException(
+                message=(
+                    f"Invalid chunking: chunk_size={chunk_size}, "
+                    f"chunk_overlap={chunk_overlap} (need 0 <= overlap < size)"
+                ),
+                error_code="INVALID_CHUNK_CONFIG"
+            )
 
-        while start < len(text):
-            end = start + chunk_size
-            chunk_text = text[start:end]
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.unit = unit
+        self.tokenizer = tokenizer
+        self.strategy = strategy
 
-            chunks.append({
-                "source": source,
-                "chunk_id": chunk_id,
-                "text": chunk_text
-            })
+    @classmethod
+    def from_config(cls, config: Dict, embedding_model=None) -> "Chunker":
+        """
+        Builds a chunker from a pipeline config section (chunk_size,
+        chunk_overlap, chunk_unit, chunking_strategy). Token limits come
+        from the model.
+        """
 
-            start = end - chunk_overlap
-            chunk_id += 1
+        unit = config.get("chunk_unit", "chars")
+        tokenizer = None
+        max_tokens = None
 
-        logger.info(
-            f"Created {chunk_id} chunks from {source}"
+        if unit == "tokens" and embedding_model is not None:
+            tokenizer = getattr(embedding_model, "tokenizer", None)
+            max_seq_length = getattr(embedding_model, "max_seq_length", None)
+            if max_seq_length:
+                max_tokens = max_seq_length - _SPECIAL_TOKENS
+
+        return cls(
+            chunk_size=config.get("chunk_size", 500),
+            chunk_overlap=config.get("chunk_overlap", 50),
+            unit=unit,
+            tokenizer=tokenizer,
+            max_tokens=max_tokens,
+            strategy=config.get("chunking_strategy", "fixed"),
         )
 
-    return chunks
+    @property
+    def settings(self) -> Dict:
+        """
+        Everything that changes the produced chunks.
+        """
+        return {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "unit": self.unit,
+            "strategy": self.strategy,
+        }
+
+    def __call__(self, documents: Iterable[Dict]) -> Iterator[Dict]:
+        for doc in documents:
+            source = doc["source"]
+            page_starts = doc.get("page_starts")
+            chunk_id = 0
+
+            # "document" references the full text (no copy) so the index
+            # can keep offsets instead of its own copy of every chunk
+            for start, end in self._windows(doc["text"]):
+                chunk = {
+                    "source": source,
+                    "chunk_id": chunk_id,
+                    "text": doc["text"][start:end],
+                    "document": doc["text"],
+                    "start": start,
+                    "end": end,
+                }
+
+                # 1-based page the chunk starts on
+                if page_starts:
+                    chunk["page"] = bisect_right(page_starts, start)
+
+                yield chunk
+                chunk_id += 1
+
+            logger.info(
+                f"Created {chunk_id} chunks from {source}"
+            )
+
+    # -----------------------------
+    # Windows
+    # -----------------------------
+
+    def _windows(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Yields (start, end) character spans of each chunk.
+        """
+
+        token_starts = token_ends = None
+
+        if self.unit == "tokens":
+            offsets = self.tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False,
+            )["offset_mapping"]
+
+            spans = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+            token_starts, token_ends = spans[:, 0], spans[:, 1]
+
+        if self.strategy == "sentence":
+            return self._sentence_windows(text, token_starts, token_ends)
+
+        return self._split_region(0, len(text), token_starts, token_ends)
+
+    def _split_region(
+        self,
+        start: int,
+        end: int,
+        token_starts: Optional[np.ndarray],
+        token_ends: Optional[np.ndarray],
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Fixed windows over text[start:end].
+        """
+
+        step = self.chunk_size - self.chunk_overlap
+
+        if token_starts is None:
+            for window_start in range(start, end, step):
+                yield window_start, min(window_start + self.chunk_size, end)
+                if window_start + self.chunk_size >= end:
+                    return
+            return
+
+        first = int(np.searchsorted(token_starts, start))
+        last = int(np.searchsorted(token_starts, end))
+
+        for window_start in range(first, last, step):
+            window_end = min(window_start + self.chunk_size, last)
+            yield int(token_starts[window_start]), int(token_ends[window_end - 1])
+            if window_end == last:
+                return
+
+    def _sentence_windows(
+        self,
+        text: str,
+        token_starts: Optional[np.ndarray],
+        token_ends: Optional[np.ndarray],
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Packs whole sentences into chunks. Linear in the number of
+        sentences; a sentence longer than chunk_size is split into
+        fixed windows on its own.
+        """
+
+        spans = np.array(
+            [match.span() for match in _SENTENCE.finditer(text)],
+            dtype=np.int64
+        ).reshape(-1, 2)
+
+        if not len(spans):
+            return
+
+        starts, ends = spans[:, 0], spans[:, 1]
+
+        if token_starts is None:
+            sizes = ends - starts
+        else:
+            sizes = (
+                np.searchsorted(token_starts, ends)
+                - np.searchsorted(token_starts, starts)
+            )
+
+        # Paragraph break before sentence i: a blank line in the gap
+        paragraph = np.zeros(len(spans), dtype=bool)
+        for i in range(1, len(spans)):
+            paragraph[i] = text.count("\n", ends[i - 1], starts[i]) >= 2
+
+        sizes = sizes.tolist()
+        budget, overlap = self.chunk_size, self.chunk_overlap
+
+        i, n = 0, len(sizes)
+        while i < n:
+            if sizes[i] > budget:
+                yield from self._split_region(
+                    int(starts[i]), int(ends[i]), token_starts, token_ends
+                )
+                i += 1
+                continue
+
+            j, total = i, 0
+            while j < n and total + sizes[j] <= budget:
+                if j > i and paragraph[j] and total >= budget // 2:
+                    break
+                total += sizes[j]
+                j += 1
+
+            yield int(starts[i]), int(ends[j - 1])
+
+            if j >= n:
+                return
+
+            # Repeat whole trailing sentences as overlap
+            k, carried = j, 0
+            while k - 1 > i and carried + sizes[k - 1] <= overlap:
+                k -= 1
+                carried += sizes[k]
+
+            i = k
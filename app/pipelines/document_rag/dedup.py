@@ -0,0 +1,239 @@
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHIFT = np.uint64(32)
+
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles of normalized text.
+
+    Shingle hashes are computed with a vectorized polynomial rolling
+    hash, and all permutations are applied in one broadcast, so a chunk
+    costs a few NumPy calls rather than a Python loop per shingle.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+        # Multiply-shift hashing: ((a * x + b) mod 2**64) >> 32, a odd
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * 2 + 1
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+        self._powers = np.uint64(257) ** np.arange(
+            shingle_size - 1, -1, -1, dtype=np.uint64
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        normalized = _WHITESPACE.sub(" ", text.lower()).strip()
+        data = np.frombuffer(normalized.encode("utf-8"), dtype=np.uint8)
+
+        if len(data) < self.shingle_size:
+            data = np.pad(data, (0, self.shingle_size - len(data)))
+
+        windows = sliding_window_view(data, self.shingle_size).astype(np.uint64)
+        shingles = np.unique((windows @ self._powers) & _MAX_HASH)
+
+        with np.errstate(over="ignore"):
+            hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> _SHIFT
+
+        return hashed.min(axis=1)
+
+
+class Deduplicator:
+    """
+    Near-duplicate detection across a stream of chunk groups.
+
+    Candidates come from LSH banding of MinHash signatures and are
+    confirmed on the full signature. The band buckets and the
+    signatures of kept chunks persist across add() calls, so a chunk is
+    collapsed into a match from any earlier group or upload, not only
+    its own; a DocumentRetriever keeps one instance for its lifetime.
+    Kept chunks that leave the index are dropped with discard().
+    Not thread-safe; callers serialize add() and discard().
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+    ):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+
+        # band -> hash of band values -> kept id
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(bands)]
+        # Signatures fit in 32 bits (see MinHasher), one row per kept id;
+        # grown by doubling
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._kept = 0
+
+    @property
+    def signatures(self) -> np.ndarray:
+        """
+        (kept ids, num_perm) signatures, discarded ids included.
+        """
+        return self._signatures[:self._kept]
+
+    def memory_bytes(self) -> int:
+        return self._signatures.nbytes
+
+    def restore(self, signatures: np.ndarray) -> None:
+        """
+        Replaces the state with kept chunks of these signatures, which
+        get kept ids 0..len(signatures)-1 (e.g. from a snapshot).
+        """
+
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = np.array(signatures, dtype=np.uint32)
+        self._kept = len(self._signatures)
+
+        for kept_id, signature in enumerate(self._signatures):
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, kept_id)
+
+    def discard(self, kept_ids) -> None:
+        """
+        Stops matching against these kept chunks.
+        """
+
+        for kept_id in kept_ids:
+            kept_id = int(kept_id)
+            for band, key in enumerate(self._band_keys(self._signatures[kept_id])):
+                if self._buckets[band].get(key) == kept_id:
+                    del self._buckets[band][key]
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [
+            hash(signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, chunks: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, Dict]], Dict]:
+        """
+        Deduplicates one group. Returns (kept, late, stats):
+
+        - kept: new unique chunks, which get kept ids in order, counting
+          on from earlier groups; those with duplicates in this group
+          carry a "locations" list (their own location first)
+        - late: (kept id, location) for chunks that duplicate a chunk
+          returned by an earlier add() call
+        """
+
+        first_id = self._kept
+        signatures = [self.hasher.signature(chunk["text"]).astype(np.uint32) for chunk in chunks]
+
+        kept: List[Dict] = []
+        members: List[List[int]] = []
+        late: List[Tuple[int, Dict]] = []
+
+        new_signatures: List[np.ndarray] = []
+
+        for i, signature in enumerate(signatures):
+            keys = self._band_keys(signature)
+
+            match = self._match(signature, keys, first_id, new_signatures)
+
+            if match is None:
+                kept_id = self._kept
+                self._kept += 1
+
+                for band, key in enumerate(keys):
+                    self._buckets[band].setdefault(key, kept_id)
+
+                kept.append(chunks[i])
+                members.append([i])
+                new_signatures.append(signature)
+
+            elif match >= first_id:
+                members[match - first_id].append(i)
+
+            else:
+                late.append((match, _location(chunks[i])))
+
+        if new_signatures:
+            self._reserve(self._kept)
+            self._signatures[first_id:self._kept] = np.stack(new_signatures)
+
+        for position, group in enumerate(members):
+            if len(group) > 1:
+                kept[position] = dict(
+                    kept[position], locations=[_location(chunks[i]) for i in group]
+                )
+
+        stats = {
+            "chunks_in": len(chunks),
+            "chunks_out": len(kept),
+            "duplicates": len(chunks) - len(kept),
+        }
+
+        if stats["duplicates"]:
+            logger.info(
+                f"Deduplicated {stats['chunks_in']} chunks to {stats['chunks_out']} "
+                f"({stats['duplicates']} near-duplicates collapsed, {len(late)} into earlier groups)"
+            )
+
+        return kept, late, stats
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._signatures):
+            return
+
+        grown = np.empty(
+            (max(capacity, 2 * len(self._signatures), 1024), self._signatures.shape[1]),
+            dtype=np.uint32
+        )
+        grown[:len(self._signatures)] = self._signatures
+        self._signatures = grown
+
+    def _match(
+        self,
+        signature: np.ndarray,
+        keys: List[int],
+        first_id: int,
+        new_signatures: List[np.ndarray],
+    ):
+        """
+        Kept id of the first candidate at or above the threshold, or None.
+        """
+
+        seen = set()
+        for band, key in enumerate(keys):
+            candidate = self._buckets[band].get(key)
+            if candidate is None or candidate in seen:
+                continue
+            seen.add(candidate)
+
+            if candidate >= first_id:
+                other = new_signatures[candidate - first_id]
+            else:
+                other = self._signatures[candidate]
+
+            if np.mean(other == signature) >= self.threshold:
+                return candidate
+
+        return None
+
+
+def _location(chunk: Dict) -> Dict:
+    location = {"source": chunk["source"], "chunk_id": chunk["chunk_id"]}
+    if "page" in chunk:
+        location["page"] = chunk["page"]
+    return location
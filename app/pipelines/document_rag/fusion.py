@@ -0,0 +1,76 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.exceptions import RetrievalException
+
+FUSION_METHODS = ("rrf", "weighted")
+
+SIGNALS = ("vector", "bm25")
+
+
+def fuse_rankings(
+    vector_ids: np.ndarray,
+    vector_scores: np.ndarray,
+    bm25_ids: np.ndarray,
+    bm25_scores: np.ndarray,
+    method: str = "rrf",
+    rrf_k: int = 60,
+    weights: Dict[str, float] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fuses two best-first candidate lists into one ranking.
+
+    "rrf" sums weight / (rrf_k + rank) per list; "weighted" sums
+    weight * min-max normalized score per list. Returns (row_ids,
+    fused_scores, contributions) sorted best first, where
+    contributions[i] holds the per-signal share of row i's score in
+    SIGNALS order.
+    """
+
+    if method not in FUSION_METHODS:
+        raise RetrievalException(
+            message=f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}",
+            error_code="INVALID_FUSION_METHOD"
+        )
+
+    weights = weights or {}
+    vector_weight = weights.get("vector", 1.0)
+    bm25_weight = weights.get("bm25", 1.0)
+
+    if method == "rrf":
+        vector_part = vector_weight / (rrf_k + np.arange(1, len(vector_ids) + 1))
+        bm25_part = bm25_weight / (rrf_k + np.arange(1, len(bm25_ids) + 1))
+    else:
+        vector_part = vector_weight * _min_max(vector_scores)
+        bm25_part = bm25_weight * _min_max(bm25_scores)
+
+    rows, inverse = np.unique(
+        np.concatenate((vector_ids, bm25_ids)).astype(np.int64),
+        return_inverse=True
+    )
+
+    contributions = np.zeros((len(rows), len(SIGNALS)), dtype=np.float32)
+    contributions[inverse[:len(vector_ids)], 0] = vector_part
+    contributions[inverse[len(vector_ids):], 1] = bm25_part
+
+    fused = contributions.sum(axis=1)
+    order = np.argsort(-fused, kind="stable")
+
+    return rows[order], fused[order], contributions[order]
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """
+    Scales scores to [0, 1]; a list of equal scores maps to 1.
+    """
+
+    scores = np.asarray(scores, dtype=np.float32)
+    if not len(scores):
+        return scores
+
+    low, high = scores.min(), scores.max()
+    if high - low <= 0:
+        return np.ones_like(scores)
+
+    return (scores - low) / (high - low)
@@ -0,0 +1,326 @@
+import queue
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+# retriever -> its most recent IngestJob
+_jobs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_jobs_lock = threading.Lock()
+
+
+class IngestJob:
+    """
+    Overlapped load -> chunk -> embed/index pipeline for one retriever.
+
+    Each stage runs on its own thread and hands work to the next through
+    a bounded queue, so page extraction, chunking and embedding proceed
+    at the same time and a slow stage applies back-pressure instead of
+    buffering the whole corpus. Chunks are indexed in small groups, so
+    the retriever answers queries as soon as the first group is in.
+
+    progress() returns a snapshot for the UI; every stage transition is
+    also recorded in `events` and passed to `on_event`.
+
+    If the job fails or is cancelled, sources that may be only partly
+    indexed are removed again, so source_fingerprints lists only
+    complete files; `on_failed` is then called instead of `on_complete`.
+    """
+
+    def __init__(
+        self,
+        retriever,
+        documents: Callable[[], Iterable[Dict]],
+        chunker: Callable[[Iterable[Dict]], Iterator[Dict]],
+        fingerprints: Optional[Dict[str, str]] = None,
+        total_documents: Optional[int] = None,
+        queue_size: int = 4,
+        group_size: int = 256,
+        on_complete: Optional[Callable[["IngestJob"], None]] = None,
+        on_failed: Optional[Callable[["IngestJob"], None]] = None,
+        on_event: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.retriever = retriever
+        self.documents = documents
+        self.chunker = chunker
+        self.fingerprints = fingerprints
+        self.total_documents = total_documents
+        self.group_size = group_size
+        self.on_complete = on_complete
+        self.on_failed = on_failed
+        self.on_event = on_event
+
+        self._document_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._chunk_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+
+        self.error: Optional[BaseException] = None
+        self.events: List[Dict] = []
+
+        self._counts = {"documents": 0, "chunks": 0}
+        self._started: Optional[float] = None
+        self._first_batch_seconds: Optional[float] = None
+
+        # Sources handed to the index stage whose chunks may not all be
+        # indexed yet: the last one seen, plus every source of the group
+        # in progress
+        self._last_source: Optional[str] = None
+        self._open_sources: set = set()
+        self._threads: List[threading.Thread] = []
+
+    # -----------------------------
+    # Control
+    # -----------------------------
+
+    def start(self) -> "IngestJob":
+        with _jobs_lock:
+            _jobs[self.retriever] = self
+
+        self._started = time.perf_counter()
+        self._emit("started")
+
+        self._threads = [
+            threading.Thread(target=self._run_stage, args=(self._load,), name="ingest-load", daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._chunk,), name="ingest-chunk", daemon=True),
+            threading.Thread(target=self._index, name="ingest-index", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        return self
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the first group is queryable (or the job ended).
+        Re-raises the job's error if it failed before that.
+        """
+
+        ready = self.ready.wait(timeout)
+        if self.error is not None and not self._counts["chunks"]:
+            raise self.error
+        return ready
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    @property
+    def running(self) -> bool:
+        return self._started is not None and not self.done.is_set()
+
+    # -----------------------------
+    # Stages
+    # -----------------------------
+
+    def _run_stage(self, stage: Callable[[], None]) -> None:
+        """
+        Runs a producer stage; a failure is recorded and the stream is
+        closed so downstream stages finish.
+        """
+
+        try:
+            stage()
+        except BaseException as e:
+            self._fail(e)
+            self.cancel()
+            self._put(self._document_queue if stage == self._load else self._chunk_queue, _DONE)
+
+    def _load(self) -> None:
+        for document in self.documents():
+            if self.cancelled.is_set():
+                break
+            if not self._put(self._document_queue, document):
+                break
+
+            self._counts["documents"] += 1
+            self._emit("loaded", source=document["source"])
+
+        self._put(self._document_queue, _DONE)
+
+    def _chunk(self) -> None:
+        group: List[Dict] = []
+
+        for chunk in self.chunker(_drain(self._document_queue)):
+            if self.cancelled.is_set():
+                break
+
+            group.append(chunk)
+            if len(group) >= self.group_size:
+                self._put(self._chunk_queue, group)
+                group = []
+
+        if group:
+            self._put(self._chunk_queue, group)
+
+        self._put(self._chunk_queue, _DONE)
+
+    def _index(self) -> None:
+        try:
+            self.retriever.add_chunks(
+                self._track_sources(
+                    chunk for group in _drain(self._chunk_queue) for chunk in group
+                ),
+                fingerprints=self.fingerprints,
+                group_size=self.group_size,
+                on_group=self._mark_indexed,
+            )
+        except BaseException as e:
+            self._fail(e)
+            self.cancel()
+        finally:
+            self._finish()
+
+    def _track_sources(self, chunks: Iterator[Dict]) -> Iterator[Dict]:
+        for chunk in chunks:
+            self._last_source = chunk["source"]
+            self._open_sources.add(chunk["source"])
+            yield chunk
+
+    def _mark_indexed(self, count: int) -> None:
+        self._counts["chunks"] += count
+        self._open_sources = set()
+
+        if not self.ready.is_set():
+            self._first_batch_seconds = time.perf_counter() - self._started
+            self.ready.set()
+            self._emit("first_batch")
+
+        self._emit("indexed", chunks=self._counts["chunks"])
+
+    def _finish(self) -> None:
+        if self.error is not None or self.cancelled.is_set():
+            self._drop_incomplete_sources()
+
+            if self.on_failed is not None:
+                try:
+                    self.on_failed(self)
+                except Exception as e:
+                    logger.warning(f"Ingest failure hook failed: {e}")
+
+        elif self.on_complete is not None:
+            try:
+                self.on_complete(self)
+            except Exception as e:
+                logger.warning(f"Ingest completion hook failed: {e}")
+
+        self.ready.set()
+        self.done.set()
+        self._emit("failed" if self.error is not None else "done")
+
+        logger.info(
+            f"Ingested {self._counts['documents']} documents, "
+            f"{self._counts['chunks']} chunks in "
+            f"{time.perf_counter() - self._started:.2f}s "
+            f"(first batch after {self._first_batch_seconds or 0.0:.2f}s)"
+        )
+
+    def _drop_incomplete_sources(self) -> None:
+        incomplete = set(self._open_sources)
+        if self._last_source is not None:
+            incomplete.add(self._last_source)
+
+        for source in incomplete:
+            try:
+                if self.retriever.remove_source(source):
+                    logger.info(f"Removed partly indexed source {source}")
+            except Exception as e:
+                logger.warning(f"Could not remove partly indexed source {source}: {e}")
+
+    def _fail(self, error: BaseException) -> None:
+        if self.error is None:
+            self.error = error
+            logger.error(f"Document ingestion failed: {error}")
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """
+        Blocking put that gives up once the job is cancelled.
+        """
+
+        while not self.cancelled.is_set() or item is _DONE:
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if item is _DONE and self.cancelled.is_set():
+                    # Nobody may be draining; make room for the marker
+                    _discard_one(target)
+        return False
+
+    # -----------------------------
+    # Progress
+    # -----------------------------
+
+    def progress(self) -> Dict:
+        if self.done.is_set():
+            state = "failed" if self.error is not None else "done"
+        elif self.ready.is_set():
+            state = "partial"
+        else:
+            state = "loading"
+
+        return {
+            "state": state,
+            "documents_loaded": self._counts["documents"],
+            "documents_total": self.total_documents,
+            "chunks_indexed": self._counts["chunks"],
+            "first_batch_seconds": self._first_batch_seconds,
+            "elapsed_seconds": (
+                time.perf_counter() - self._started if self._started else 0.0
+            ),
+            "error": str(self.error) if self.error is not None else None,
+        }
+
+    def _emit(self, stage: str, **details) -> None:
+        event = dict(details, stage=stage, at=time.time())
+        self.events.append(event)
+
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logger.warning(f"Ingest event hook failed: {e}")
+
+
+def last_job(retriever) -> Optional[IngestJob]:
+    """
+    The most recent ingestion into `retriever`, running or finished.
+    """
+
+    with _jobs_lock:
+        return _jobs.get(retriever)
+
+
+def active_job(retriever) -> Optional[IngestJob]:
+    """
+    The ingestion still writing into `retriever`, if any.
+    """
+
+    job = last_job(retriever)
+    return job if job is not None and job.running else None
+
+
+def _drain(source: queue.Queue) -> Iterator:
+    while True:
+        item = source.get()
+        if item is _DONE:
+            return
+        yield item
+
+
+def _discard_one(target: queue.Queue) -> None:
+    try:
+        target.get_nowait()
+    except queue.Empty:
+        pass
@@ -1,71 +1,296 @@
-from typing import List, Dict
-import io
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+import atexit
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 from app.utils.logger import get_logger
 from app.exceptions import RetrievalException
+from app.storage.text_cache import TextCache
 
 logger = get_logger(__name__)
 
+_HASH_BLOCK_SIZE = 1 << 20
 
-def load_documents(uploaded_files: List[Dict]) -> List[Dict]:
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def file_fingerprint(file_obj: Dict) -> str:
     """
-    Loads uploaded documents and extracts raw text.
+    SHA-256 of an upload's bytes, hashed block by block and memoized
+    on the upload dict.
     """
 
-    documents = []
-
-    for file_obj in uploaded_files:
-        filename = file_obj["name"]
+    if "sha256" not in file_obj:
         file = file_obj["file"]
+        file.seek(0)
+
+        digest = hashlib.sha256()
+        for block in iter(lambda: file.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+
+        file.seek(0)
+        file_obj["sha256"] = digest.hexdigest()
 
-        logger.info(f"Loading document: {filename}")
+    return file_obj["sha256"]
+
+
+def iter_documents(
+    uploaded_files: List[Dict],
+    workers: Optional[int] = 1,
+    pages_per_task: int = 16,
+    min_parallel_pages: int = 32,
+    text_cache: Optional[TextCache] = None,
+) -> Iterator[Dict]:
+    """
+    Yields each uploaded document ({"source", "text", "page_starts"})
+    in upload order, as soon as its pages are extracted.
+
+    PDFs are split into page ranges of `pages_per_task` and DOCX files
+    are one task each; with workers > 1 (None -> one per core) and at
+    least `min_parallel_pages` PDF pages in total, the tasks of all files
+    run together on a process pool. "page_starts" holds the character
+    offset of every page (1-based page i starts at page_starts[i - 1];
+    absent for .txt), which the chunker turns into chunk "page"s.
+
+    With a `text_cache`, PDF and DOCX files whose SHA-256 is cached are
+    not parsed at all, and new extractions are added to the cache.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory(prefix="querywave-load-") as scratch:
+        plans = []
+        for file_obj in uploaded_files:
+            try:
+                plans.append(_plan(file_obj, scratch, pages_per_task, text_cache))
+            except Exception as e:
+                logger.error(f"Failed to load document {file_obj['name']}: {e}")
+                raise
+
+        total_pages = sum(plan["pages"] for plan in plans if plan["kind"] == "pdf")
+        parallel = workers > 1 and total_pages >= min_parallel_pages
+
+        if parallel:
+            logger.info(
+                f"Extracting {len(plans)} file(s), {total_pages} PDF pages, "
+                f"on {workers} workers"
+            )
+            pool = get_extraction_pool(workers)
+            for plan in plans:
+                plan["futures"] = [pool.submit(*task) for task in plan["tasks"]]
 
         try:
-            # 🔥 Always reset pointer first
-            file.seek(0)
-
-            if filename.lower().endswith(".txt"):
-                text = file.read().decode("utf-8")
-
-            elif filename.lower().endswith(".pdf"):
-                import fitz  # PyMuPDF
-
-                file_bytes = file.read()
-
-                if not file_bytes:
-                    raise RetrievalException(
-                        message=f"Uploaded PDF is empty: {filename}",
-                        error_code="EMPTY_PDF_STREAM"
-                    )
-
-                with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-                    text = "\n".join(page.get_text() for page in doc)
-
-            elif filename.lower().endswith(".docx"):
-                from docx import Document
-                doc = Document(io.BytesIO(file.read()))
-                text = "\n".join(p.text for p in doc.paragraphs)
-
-            else:
-                raise RetrievalException(
-                    message=f"Unsupported file type: {filename}",
-                    error_code="UNSUPPORTED_FILE_TYPE"
-                )
-
-            if not text.strip():
-                raise RetrievalException(
-                    message=f"No text extracted from {filename}",
-                    error_code="EMPTY_DOCUMENT"
-                )
-
-            documents.append({
-                "source": filename,
-                "text": text
-            })
-
-        except Exception as e:
-            logger.error(f"Failed to load document {filename}: {e}")
-            raise
-
-    logger.info(f"Loaded {len(documents)} documents")
-    return documents
+            for plan in plans:
+                yield _assemble(plan, parallel, text_cache)
+        finally:
+            # Stopped early or failed: drop the extraction still queued
+            for plan in plans:
+                for pending in plan.get("futures", []):
+                    pending.cancel()
+
+
+# -----------------------------
+# Extraction plans
+# -----------------------------
+
+def _plan(
+    file_obj: Dict,
+    scratch: str,
+    pages_per_task: int,
+    text_cache: Optional[TextCache] = None,
+) -> Dict:
+    """
+    Splits one upload into extraction tasks ((function, *args) tuples
+    that each return a list of page texts, in page order). A cached
+    upload gets no tasks.
+    """
+
+    filename = file_obj["name"]
+    file = file_obj["file"]
+
+    logger.info(f"Loading document: {filename}")
+
+    # 🔥 Always reset pointer first
+    file.seek(0)
+    lowered = filename.lower()
+
+    if lowered.endswith(".txt"):
+        text = file.read().decode("utf-8")
+        return {"source": filename, "kind": "txt", "pages": 1, "tasks": [(_as_pages, text)]}
+
+    if not lowered.endswith((".pdf", ".docx")):
+        raise RetrievalException(
+            message=f"Unsupported file type: {filename}",
+            error_code="UNSUPPORTED_FILE_TYPE"
+        )
+
+    kind = "pdf" if lowered.endswith(".pdf") else "docx"
+    plan = {"source": filename, "kind": kind, "pages": 0, "tasks": []}
+
+    if text_cache is not None:
+        plan["digest"] = file_fingerprint(file_obj)
+        plan["cached"] = text_cache.get(plan["digest"])
+        if plan["cached"] is not None:
+            return plan
+
+    # Workers open the file from disk, so the bytes are copied once, block
+    # by block, rather than read whole and pickled into every task
+    file.seek(0)
+    fd, path = tempfile.mkstemp(suffix=f".{kind}", dir=scratch)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(file, f, _HASH_BLOCK_SIZE)
+    file.seek(0)
+
+    if kind == "docx":
+        plan["tasks"] = [(_extract_docx_pages, path)]
+        return plan
+
+    import fitz  # PyMuPDF
+
+    if not os.path.getsize(path):
+        raise RetrievalException(
+            message=f"Uploaded PDF is empty: {filename}",
+            error_code="EMPTY_PDF_STREAM"
+        )
+
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+
+    plan["pages"] = page_count
+    plan["tasks"] = [
+        (extract_pdf_pages, path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    return plan
+
+
+def _assemble(
+    plan: Dict,
+    parallel: bool,
+    text_cache: Optional[TextCache] = None,
+) -> Dict:
+    filename = plan["source"]
+
+    cached = plan.get("cached")
+    if cached is not None:
+        return {"source": filename, "text": cached["text"], "page_starts": cached["page_starts"]}
+
+    try:
+        if parallel:
+            parts = [future.result() for future in plan["futures"]]
+        else:
+            parts = [function(*args) for function, *args in plan["tasks"]]
+
+        text, page_starts = join_pages(page for part in parts for page in part)
+
+        if not text.strip():
+            raise RetrievalException(
+                message=f"No text extracted from {filename}",
+                error_code="EMPTY_DOCUMENT"
+            )
+
+    except Exception as e:
+        logger.error(f"Failed to load document {filename}: {e}")
+        raise
+
+    # Plain text has no pages
+    if plan["kind"] == "txt":
+        return {"source": filename, "text": text}
+
+    if text_cache is not None:
+        text_cache.put(plan["digest"], text, page_starts)
+
+    return {"source": filename, "text": text, "page_starts": page_starts}
+
+
+def join_pages(pages: Iterable[str]) -> Tuple[str, List[int]]:
+    """
+    Joins page texts with newlines and records where each page starts.
+    """
+
+    pages = list(pages)
+    page_starts = []
+    offset = 0
+
+    for page in pages:
+        page_starts.append(offset)
+        offset += len(page) + 1
+
+    return "\n".join(pages), page_starts
+
+
+def _as_pages(text: str) -> List[str]:
+    return [text]
+
+
+# -----------------------------
+# Worker tasks
+# -----------------------------
+
+def extract_pdf_pages(path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """
+    Page texts of pages [start, stop) (stop None -> to the end). Runs in
+    extraction workers.
+    """
+
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        stop = doc.page_count if stop is None else stop
+        return [doc.load_page(number).get_text() for number in range(start, stop)]
+
+
+def _extract_docx_pages(path: str) -> List[str]:
+    """
+    DOCX has no fixed pagination; pages are cut at explicit and
+    last-rendered page breaks stored by the authoring application.
+    """
+
+    from docx import Document
+
+    doc = Document(path)
+
+    pages = [[]]
+    for paragraph in doc.paragraphs:
+        breaks = paragraph._p.xpath(".//w:br[@w:type='page'] | .//w:lastRenderedPageBreak")
+        if breaks and pages[-1]:
+            pages.append([])
+        pages[-1].append(paragraph.text)
+
+    return ["\n".join(page) for page in pages]
+
+
+# -----------------------------
+# Worker pool
+# -----------------------------
+
+def get_extraction_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    One long-lived extraction pool per size, shared with the arXiv
+    fetcher.
+    """
+
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            logger.info(f"Starting extraction pool with {workers} workers")
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pools[workers] = pool
+
+    return pool
+
+
+@atexit.register
+def _shutdown_pools() -> None:
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,71 +1,862 @@
-from typing import List, Dict
-from rank_bm25 import BM25Okapi
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, List, Dict, Optional
+
+import numpy as np
 
 from app.utils.logger import get_logger
+from app.exceptions import StorageException
 from app.storage.vector_store import VectorStore
+from app.storage.bm25_index import BM25Index
+from app.storage.chunk_store import ChunkStore, chunk_record
+from app.utils.text_analyzer import get_analyzer
+from app.llm.embedding_pipeline import EmbeddingPipeline
+from app.pipelines.document_rag.dedup import Deduplicator
+from app.pipelines.document_rag.fusion import SIGNALS, fuse_rankings
 
 logger = get_logger(__name__)
 
+SNAPSHOT_FORMAT_VERSION = 3
+
 
 class DocumentRetriever:
 
-    def __init__(self, embedding_model):
+    def __init__(self, embedding_model, config: Optional[Dict] = None):
         self.embedding_model = embedding_model
+        self.config = config or {}
+        self.compact_threshold = self.config.get("compact_threshold", 0.3)
+
+        self.analyzer = get_analyzer(self.config.get("analyzer"))
+        self.last_stats: Dict = {}
+        self.last_dedup_stats: Dict = {}
+
+        # Guards the indexes so queries can run while chunks are still
+        # being appended (see ingest.IngestJob); embedding runs outside it
+        self._lock = threading.RLock()
+
+        # Serializes the deduplicator, whose signature hashing should not
+        # hold up queries
+        self._dedup_lock = threading.Lock()
+
+        pipeline_config = self.config.get("embedding", {})
+        self.embedding_pipeline = EmbeddingPipeline(
+            embedding_model,
+            batch_size=pipeline_config.get("batch_size", 64),
+            sort_by_length=pipeline_config.get("sort_by_length", True),
+            workers=pipeline_config.get("workers", 0),
+            min_parallel_chunks=pipeline_config.get("min_parallel_chunks", 2048),
+        )
+
+        self._reset()
+
+    def _reset(self) -> None:
         self.vector_store = VectorStore(
-            embedding_dim=embedding_model.get_sentence_embedding_dimension()
+            embedding_dim=self.embedding_model.get_sentence_embedding_dimension(),
+            index_config=self.config.get("vector_index"),
+            quantization_config=self.config.get("quantization")
+        )
+        self.bm25 = BM25Index()
+
+        # Row-aligned chunk offsets; text is materialized per result
+        self.chunks = ChunkStore()
+
+        # source name -> {"fingerprint": content hash or None,
+        #                 "rows": sorted row ids, "added_at": epoch seconds}
+        self.sources: Dict[str, Dict] = {}
+
+        # Near-duplicate state shared by every add_chunks() call, so a
+        # chunk is matched against all earlier uploads. Deduplicator kept
+        # id -> row (-1 until its group is embedded, or once removed), and
+        # locations of later duplicates waiting for that row.
+        dedup_config = self.config.get("dedup", {})
+        self._deduplicator: Optional[Deduplicator] = None
+        if dedup_config.get("enabled", False):
+            self._deduplicator = Deduplicator(
+                threshold=dedup_config.get("threshold", 0.9),
+                num_perm=dedup_config.get("num_perm", 64),
+                bands=dedup_config.get("bands", 16),
+                shingle_size=dedup_config.get("shingle_size", 5),
+            )
+        self._dedup_rows = np.empty(0, dtype=np.int64)
+        self._pending_locations: Dict[int, List] = {}
+
+    @property
+    def source_fingerprints(self) -> Dict[str, Optional[str]]:
+        return {
+            source: entry["fingerprint"]
+            for source, entry in self.sources.items()
+        }
+
+    def memory_bytes(self) -> int:
+        """
+        Rough resident size: vector rows, BM25 arrays, document text,
+        chunk offsets and dedup signatures.
+        """
+
+        vector_stats = self.vector_store.memory_stats()
+        vector_bytes = vector_stats["bytes_per_chunk"] * vector_stats["rows"]
+
+        dedup_bytes = self._dedup_rows.nbytes
+        if self._deduplicator is not None:
+            dedup_bytes += self._deduplicator.memory_bytes()
+
+        return int(
+            vector_bytes + self.bm25.memory_bytes() + self.chunks.memory_bytes() + dedup_bytes
+        )
+
+    def index_chunks(self, chunks: Iterable[Dict]):
+        """
+        Builds the index from scratch.
+        """
+
+        self._reset()
+        self.add_chunks(chunks)
+
+        logger.info("Hybrid index created (Vector + BM25)")
+
+    # -----------------------------
+    # Incremental updates
+    # -----------------------------
+
+    def add_chunks(
+        self,
+        chunks: Iterable[Dict],
+        fingerprints: Optional[Dict[str, str]] = None,
+        group_size: Optional[int] = None,
+        on_group: Optional[Callable[[int], None]] = None
+    ) -> None:
+        """
+        Appends chunks to the vector store and BM25 postings without
+        touching existing rows. `fingerprints` maps source -> content hash
+        so callers can later tell which sources are stale.
+
+        `chunks` may be a generator: it is consumed in groups of
+        `group_size` (default embedding.stream_chunks), so the full chunk
+        list is never built, and every finished embedding batch is
+        queryable right away. `on_group(count)` is called after each
+        group is indexed.
+        With dedup enabled, near-identical chunks are collapsed before
+        embedding and embedded once; the kept row lists every location in
+        "locations". Matches are found against everything indexed so far,
+        by this call or earlier ones, so a duplicate of an already indexed
+        chunk only adds a location. Concurrent calls are safe.
+        """
+
+        group_size = group_size or self.config.get("embedding", {}).get("stream_chunks", 4096)
+        chunks = iter(chunks)
+
+        # id(document text) -> doc id, so a document split across groups
+        # is stored once
+        open_documents: Dict[int, int] = {}
+
+        added = 0
+        dedup_totals: Dict = {}
+
+        while True:
+            group = list(islice(chunks, group_size))
+            if not group:
+                break
+
+            added += len(group)
+            dedup_stats = self._add_group(group, fingerprints or {}, open_documents)
+
+            if on_group is not None:
+                on_group(len(group))
+
+            for key, value in (dedup_stats or {}).items():
+                dedup_totals[key] = dedup_totals.get(key, 0) + value
+
+        self._build_vector_index()
+
+        logger.info(
+            f"Indexed {added} chunks (total {len(self.chunks)})"
         )
-        self.bm25 = None
-        self.corpus = []
 
-    def index_chunks(self, chunks: List[Dict]):
+        if dedup_totals:
+            self.last_dedup_stats = dedup_totals
+
+            logger.info(
+                f"Dedup skipped {dedup_totals['duplicates']} chunks, "
+                f"saving ~{dedup_totals['embedding_seconds_saved']:.2f}s of embedding"
+            )
+
+    def _add_group(
+        self,
+        chunks: List[Dict],
+        fingerprints: Dict[str, str],
+        open_documents: Dict[int, int]
+    ) -> Optional[Dict]:
 
+        dedup_stats = None
+        late: List = []
+        kept_ids = None
+
+        if self._deduplicator is not None:
+            with self._dedup_lock:
+                first_kept = len(self._deduplicator.signatures)
+                chunks, late, dedup_stats = self._deduplicator.add(chunks)
+
+            kept_ids = np.arange(first_kept, first_kept + len(chunks), dtype=np.int64)
+            with self._lock:
+                self._reserve_dedup_rows(first_kept + len(chunks))
+                for kept_id, location in late:
+                    self._add_duplicate(kept_id, location, fingerprints)
+
+        # Chunk text slices are only held until their batch is indexed
         texts = [chunk["text"] for chunk in chunks]
-        embeddings = self.embedding_model.encode(texts).tolist()
+        with self._lock:
+            records = [
+                chunk_record(chunk, self._document_id(chunk, open_documents))
+                for chunk in chunks
+            ]
+
+        try:
+            # Rows are appended in batch completion order
+            for positions, embeddings in self.embedding_pipeline.iter_batches(texts):
+                self._append(
+                    [records[i] for i in positions],
+                    [texts[i] for i in positions],
+                    embeddings,
+                    fingerprints,
+                    None if kept_ids is None else kept_ids[positions]
+                )
+        except BaseException:
+            if kept_ids is not None:
+                self._forget_unindexed(kept_ids)
+            raise
+
+        if dedup_stats is not None:
+            embed_stats = self.embedding_pipeline.last_stats
+            per_chunk = embed_stats.get("seconds", 0.0) / max(embed_stats.get("chunks", 0), 1)
+            dedup_stats["embedding_seconds_saved"] = dedup_stats["duplicates"] * per_chunk
 
-        metadatas = [
+        return dedup_stats
+
+    def _document_id(self, chunk: Dict, open_documents: Dict[int, int]) -> int:
+        """
+        Stores the chunk's document text once per add_chunks() call.
+        Chunks without a "document" reference are their own document.
+        """
+
+        document = chunk.get("document")
+        if document is None:
+            return self.chunks.add_document(chunk["text"])
+
+        doc = open_documents.get(id(document))
+        if doc is None:
+            doc = self.chunks.add_document(document)
+            open_documents[id(document)] = doc
+
+        return doc
+
+    def _append(
+        self,
+        records: List[Dict],
+        texts: List[str],
+        embeddings,
+        fingerprints: Dict[str, str],
+        kept_ids: Optional[np.ndarray] = None
+    ) -> int:
+
+        # Uncached: chunks are tokenized once and must not pin the
+        # analyzer's query / message cache
+        tokens = [self.analyzer.analyze(text) for text in texts]
+
+        with self._lock:
+            # Vector index (rows only; the chunk store holds the metadata)
+            self.vector_store.add(embeddings)
+
+            # BM25 index
+            self.bm25.add_documents(tokens)
+
+            first_row = self.chunks.append(records)
+            self._register_sources(first_row, len(records), fingerprints)
+
+            if kept_ids is not None:
+                self._dedup_rows[kept_ids] = np.arange(first_row, first_row + len(records))
+
+                # Duplicates found by other calls while this batch embedded
+                for kept_id in kept_ids.tolist():
+                    for location, pending_fingerprints in self._pending_locations.pop(kept_id, []):
+                        self._add_location(
+                            int(self._dedup_rows[kept_id]), location, pending_fingerprints
+                        )
+
+        return first_row
+
+    # -----------------------------
+    # Dedup bookkeeping
+    # -----------------------------
+
+    def _reserve_dedup_rows(self, capacity: int) -> None:
+        """
+        Caller holds the lock.
+        """
+
+        if capacity > len(self._dedup_rows):
+            grown = np.full(max(capacity, 2 * len(self._dedup_rows), 1024), -1, dtype=np.int64)
+            grown[:len(self._dedup_rows)] = self._dedup_rows
+            self._dedup_rows = grown
+
+    def _add_duplicate(self, kept_id: int, location: Dict, fingerprints: Dict[str, str]) -> None:
+        """
+        Adds a location to the row of an earlier kept chunk, or queues it
+        until a concurrent call has indexed that row. Caller holds the lock.
+        """
+
+        row = int(self._dedup_rows[kept_id])
+        if row >= 0:
+            self._add_location(row, location, fingerprints)
+        else:
+            self._pending_locations.setdefault(kept_id, []).append((location, fingerprints))
+
+    def _forget_unindexed(self, kept_ids: np.ndarray) -> None:
+        """
+        Drops kept chunks of a failed group that never got a row, so
+        later duplicates are indexed instead of pointing at nothing.
+        """
+
+        with self._lock, self._dedup_lock:
+            unindexed = kept_ids[self._dedup_rows[kept_ids] < 0]
+            self._deduplicator.discard(unindexed)
+            for kept_id in unindexed.tolist():
+                self._pending_locations.pop(kept_id, None)
+
+    def _forget_rows(self, rows: List[int]) -> None:
+        """
+        Drops the kept chunks stored in removed rows. Caller holds the lock.
+        """
+
+        if self._deduplicator is None or not rows:
+            return
+
+        gone = np.flatnonzero(np.isin(self._dedup_rows, rows))
+        self._dedup_rows[gone] = -1
+
+        with self._dedup_lock:
+            self._deduplicator.discard(gone)
+
+    def _add_location(self, row: int, location: Dict, fingerprints: Dict[str, str]) -> None:
+        """
+        Records one more location of an indexed (collapsed) row.
+        Caller holds the lock.
+        """
+
+        locations = self.chunks.locations.get(row)
+        if not locations:
+            own = self.chunks.metadata(row)
+            locations = [{
+                key: own[key] for key in ("source", "chunk_id", "page") if key in own
+            }]
+
+        self.chunks.locations[row] = locations + [location]
+
+        source = location["source"]
+        entry = self.sources.setdefault(
+            source,
             {
-                "source": chunk["source"],
-                "chunk_id": chunk["chunk_id"],
-                "text": chunk["text"]
+                "fingerprint": None,
+                "rows": np.empty(0, dtype=np.int64),
+                "added_at": time.time(),
             }
-            for chunk in chunks
-        ]
+        )
+        if row not in entry["rows"]:
+            entry["rows"] = np.append(entry["rows"], np.int64(row))
 
-        # Vector index
-        self.vector_store.add(embeddings, metadatas)
+        if source in fingerprints:
+            entry["fingerprint"] = fingerprints[source]
 
-        # BM25 index
-        tokenized_corpus = [text.split() for text in texts]
-        self.bm25 = BM25Okapi(tokenized_corpus)
-        self.corpus = metadatas
+    def remove_source(self, source: str) -> bool:
+        """
+        Drops every chunk of `source`. Returns False if it was not indexed.
+        Collapsed rows that other indexed sources still point to are kept,
+        minus this source's locations.
+        """
 
-        logger.info("Hybrid index created (Vector + BM25)")
+        with self._lock:
+            removed = self._remove_source(source)
+
+        self._build_vector_index()
+        return removed
+
+    def _remove_source(self, source: str) -> bool:
+        entry = self.sources.pop(source, None)
+        if entry is None:
+            return False
+
+        doomed = []
+        for row in entry["rows"].tolist():
+            remaining = [
+                location for location in self.chunks.locations.get(row, [])
+                if location["source"] != source
+            ]
+
+            if not remaining:
+                doomed.append(row)
+                continue
+
+            self.chunks.relabel(row, remaining[0], remaining)
+
+        self.vector_store.delete(doomed)
+        self.bm25.remove(doomed)
+        self._forget_rows(doomed)
+
+        logger.info(f"Removed {len(doomed)} chunks of {source}")
+
+        if self.vector_store.deleted_count > self.compact_threshold * len(self.chunks):
+            self._compact()
+
+        return True
+
+    def compact(self) -> None:
+        """
+        Reclaims rows of removed sources in the vector store, BM25
+        postings and chunk store, keeping them aligned.
+        """
+
+        with self._lock:
+            self._compact()
+
+        self._build_vector_index()
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
+    def _compact(self) -> None:
+        keep = self.vector_store.live_rows
+
+        self.vector_store.compact(keep)
+        self.bm25.compact(keep)
+        self.chunks.compact(keep)
+
+        remap = np.empty(int(keep[-1]) + 1 if len(keep) else 0, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+
+        for entry in self.sources.values():
+            entry["rows"] = remap[entry["rows"]]
+
+        indexed = self._dedup_rows >= 0
+        self._dedup_rows[indexed] = remap[self._dedup_rows[indexed]]
+
+    def _build_vector_index(self) -> None:
+        """
+        Trains the vector store's IVF index when it is missing or stale.
+        K-means runs outside the lock, so queries keep being answered
+        (by exact scan) meanwhile; rows appended during training are
+        assigned when the index is installed.
+        """
+
+        with self._lock:
+            store = self.vector_store
+            pending = store.prepare_index()
+
+        if pending is None:
+            return
+
+        rows, generation = pending
+        ann = store.train_index(rows)
+
+        with self._lock:
+            if self.vector_store is store:
+                store.install_index(ann, generation)
+
+    def _register_sources(
+        self,
+        first_row: int,
+        count: int,
+        fingerprints: Dict[str, str],
+        added_at: Optional[Dict[str, float]] = None
+    ) -> None:
+
+        now = time.time()
+        added_at = added_at or {}
+
+        rows_by_source: Dict[str, List[int]] = {}
+        for row in range(first_row, first_row + count):
+            for source in self.chunks.sources_of(row):
+                rows_by_source.setdefault(source, []).append(row)
+
+        for source, rows in rows_by_source.items():
+            entry = self.sources.setdefault(
+                source,
+                {
+                    "fingerprint": None,
+                    "rows": np.empty(0, dtype=np.int64),
+                    "added_at": added_at.get(source, now),
+                }
+            )
+            entry["rows"] = np.concatenate((entry["rows"], np.asarray(rows, dtype=np.int64)))
+
+            if source in fingerprints:
+                entry["fingerprint"] = fingerprints[source]
+
+    # -----------------------------
+    # Snapshots
+    # -----------------------------
+
+    def save(self, directory: str) -> None:
+        """
+        Writes a snapshot: vectors.npy, bm25_*.npy postings, chunk offsets
+        with their document texts, and a manifest. The snapshot is built
+        in a temporary directory and swapped in by renames (the old one is
+        moved aside first, then deleted), so readers see a complete
+        snapshot or, for a moment, none; a crash mid-swap leaves the old
+        one readable aside.
+        """
+
+        directory = Path(directory)
+        directory.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            if self.vector_store.deleted_count:
+                self._compact()
+
+        # Trained before the snapshot is written so it carries the index
+        self._build_vector_index()
+
+        with self._lock:
+            self._save(directory)
+
+        logger.info(f"Saved retriever snapshot to {directory}")
+
+    def _save(self, directory: Path) -> None:
+        if self.vector_store.deleted_count:
+            self._compact()
+
+        tmp_dir = Path(tempfile.mkdtemp(dir=directory.parent, prefix=".snapshot-"))
+
+        try:
+            self.vector_store.save(tmp_dir)
+            self.bm25.save(tmp_dir)
+
+            self.chunks.save(tmp_dir)
+            self._save_dedup(tmp_dir)
+
+            with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "format_version": SNAPSHOT_FORMAT_VERSION,
+                        "embedding_dim": self.vector_store.embedding_dim,
+                        "chunk_count": len(self.chunks),
+                        "analyzer": self.analyzer.settings,
+                        "sources": self.source_fingerprints,
+                        "added_at": {
+                            source: entry["added_at"]
+                            for source, entry in self.sources.items()
+                        },
+                    },
+                    f,
+                )
+
+            aside = _aside_path(directory)
+            if directory.exists():
+                if aside.exists():
+                    shutil.rmtree(aside)
+                os.replace(directory, aside)
+            os.replace(tmp_dir, directory)
+
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        shutil.rmtree(aside, ignore_errors=True)
+
+    def _save_dedup(self, directory: Path) -> None:
+        """
+        Writes the signatures of indexed kept chunks to dedup.npz, so
+        uploads after a reload are still matched against them.
+        """
+
+        if self._deduplicator is None:
+            return
+
+        with self._dedup_lock:
+            signatures = self._deduplicator.signatures
+            indexed = np.flatnonzero(self._dedup_rows[:len(signatures)] >= 0)
+
+            np.savez(
+                directory / "dedup.npz",
+                signatures=signatures[indexed],
+                rows=self._dedup_rows[indexed],
+                shingle_size=np.array(self._deduplicator.hasher.shingle_size),
+            )
+
+    def _load_dedup(self, directory: Path) -> None:
+        path = directory / "dedup.npz"
+        if self._deduplicator is None or not path.exists():
+            return
+
+        with np.load(path) as state:
+            signatures = state["signatures"]
+            rows = state["rows"]
+            shingle_size = int(state["shingle_size"])
+
+        hasher = self._deduplicator.hasher
+        if signatures.shape[1] != hasher.num_perm or shingle_size != hasher.shingle_size:
+            logger.info(f"Ignoring dedup signatures in {directory} from other settings")
+            return
+
+        self._deduplicator.restore(signatures)
+        self._dedup_rows = rows.astype(np.int64)
+
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        embedding_model,
+        config: Optional[Dict] = None,
+    ) -> "DocumentRetriever":
+        """
+        Restores a snapshot written by save(). Vectors, postings and
+        chunk offsets are memory-mapped read-only.
+        """
+
+        directory = _resolve_snapshot(Path(directory))
+        manifest = read_snapshot_manifest(directory) if directory else None
+
+        if manifest is None:
+            raise StorageException(
+                message=f"No retriever snapshot at {directory}",
+                error_code="SNAPSHOT_NOT_FOUND"
+            )
+
+        expected_dim = embedding_model.get_sentence_embedding_dimension()
+        if manifest["embedding_dim"] != expected_dim:
+            raise StorageException(
+                message=(
+                    f"Snapshot embedding dim {manifest['embedding_dim']} "
+                    f"does not match model dim {expected_dim}"
+                ),
+                error_code="SNAPSHOT_DIM_MISMATCH"
+            )
+
+        retriever = cls(embedding_model, config=config)
+
+        if manifest.get("analyzer") != retriever.analyzer.settings:
+            raise StorageException(
+                message=(
+                    f"Snapshot was tokenized with {manifest.get('analyzer')}, "
+                    f"current analyzer is {retriever.analyzer.settings}"
+                ),
+                error_code="SNAPSHOT_ANALYZER_MISMATCH"
+            )
+
+        try:
+            retriever.chunks = ChunkStore.load(directory)
+            retriever.vector_store = VectorStore.load(
+                directory,
+                metadatas=None,
+                index_config=retriever.config.get("vector_index"),
+                quantization_config=retriever.config.get("quantization"),
+            )
+            retriever.bm25 = BM25Index.load(directory)
+            retriever._load_dedup(directory)
+        except (OSError, ValueError) as e:
+            # e.g. replaced by another process's save() while loading
+            raise StorageException(
+                message=f"Could not read retriever snapshot at {directory}: {e}",
+                error_code="SNAPSHOT_UNREADABLE"
+            ) from e
+        retriever._register_sources(
+            0,
+            len(retriever.chunks),
+            manifest.get("sources", {}),
+            manifest.get("added_at", {})
+        )
+
+        logger.info(
+            f"Loaded retriever snapshot from {directory} "
+            f"({len(retriever.chunks)} chunks)"
+        )
+
+        return retriever
+
+    # -----------------------------
+    # Retrieval
+    # -----------------------------
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Hybrid retrieval: each side is searched to `candidate_depth`, the
+        two rankings are fused, and the best `top_k` chunks are returned
+        with their fused "score" and per-signal "scores".
+
+        `filters` restricts the search before scoring; see filter_rows().
+        """
+
+        hybrid_config = self.config.get("hybrid", {})
+        depth = max(top_k, hybrid_config.get("candidate_depth", 50))
+
+        started = time.perf_counter()
+
+        query_embedding = self.embedding_model.encode(query)
+        tokenized_query = self.analyzer.tokens(query)
+
+        with self._lock:
+            return self._retrieve(
+                query_embedding, tokenized_query, top_k, depth, filters, started
+            )
+
+    def _retrieve(
+        self,
+        query_embedding,
+        tokenized_query,
+        top_k: int,
+        depth: int,
+        filters: Optional[Dict],
+        started: float
+    ) -> List[Dict]:
+
+        hybrid_config = self.config.get("hybrid", {})
+
+        allowed = self.filter_rows(filters) if filters else None
+        if allowed is not None and not len(allowed):
+            logger.info(f"No chunks match filters {filters}")
+            return []
 
         # Vector retrieval
-        query_embedding = self.embedding_model.encode(query).tolist()
-        vector_results = self.vector_store.search(query_embedding, top_k=top_k)
+        vector_ids, vector_scores = self.vector_store.search_ids(
+            query_embedding,
+            top_k=depth,
+            rows=allowed
+        )
+        vector_done = time.perf_counter()
 
         # BM25 retrieval
-        tokenized_query = query.split()
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        bm25_top_indices = sorted(
-            range(len(bm25_scores)),
-            key=lambda i: bm25_scores[i],
-            reverse=True
-        )[:top_k]
-
-        bm25_results = [self.corpus[i] for i in bm25_top_indices]
+        bm25_ids, bm25_scores = self.bm25.top_k(tokenized_query, depth, rows=allowed)
+        bm25_done = time.perf_counter()
 
-        # Merge results (simple union)
-        combined = { (r["source"], r["chunk_id"]): r for r in vector_results }
+        rows, fused, contributions = fuse_rankings(
+            vector_ids,
+            vector_scores,
+            bm25_ids,
+            bm25_scores,
+            method=hybrid_config.get("fusion", "rrf"),
+            rrf_k=hybrid_config.get("rrf_k", 60),
+            weights=hybrid_config.get("weights"),
+        )
+        finished = time.perf_counter()
 
-        for r in bm25_results:
-            combined[(r["source"], r["chunk_id"])] = r
+        # Only the final top_k chunks are materialized as text
+        final_results = [
+            dict(
+                self.chunks.metadata(row),
+                score=float(fused[i]),
+                scores=dict(zip(SIGNALS, contributions[i].tolist()))
+            )
+            for i, row in enumerate(rows[:top_k])
+        ]
 
-        final_results = list(combined.values())[:top_k]
+        self.last_stats = {
+            "candidate_depth": depth,
+            "filtered_rows": None if allowed is None else len(allowed),
+            "candidates": len(rows),
+            "vector_ms": (vector_done - started) * 1000,
+            "bm25_ms": (bm25_done - vector_done) * 1000,
+            "fusion_ms": (finished - bm25_done) * 1000,
+        }
 
-        logger.info(f"Hybrid retrieval returned {len(final_results)} chunks")
+        logger.info(
+            f"Hybrid retrieval returned {len(final_results)} chunks "
+            f"from {len(rows)} candidates (depth {depth}, "
+            f"{(finished - started) * 1000:.1f} ms)"
+        )
 
         return final_results
+
+    def filter_rows(self, filters: Dict) -> Optional[np.ndarray]:
+        """
+        Resolves filter predicates to sorted row ids, or None for "all".
+
+        Supported keys:
+            sources:         list of source names
+            page_range:      [first, last] page, inclusive
+            uploaded_after:  epoch seconds the source was indexed after
+            uploaded_before: epoch seconds the source was indexed before
+
+        Source and time predicates select whole per-source row arrays;
+        the page range is then applied to those rows only.
+        """
+
+        names = filters.get("sources")
+        after = filters.get("uploaded_after")
+        before = filters.get("uploaded_before")
+        page_range = filters.get("page_range")
+
+        rows = None
+
+        if names is not None or after is not None or before is not None:
+            selected = [
+                entry["rows"]
+                for source, entry in self.sources.items()
+                if (names is None or source in names)
+                and (after is None or entry["added_at"] >= after)
+                and (before is None or entry["added_at"] <= before)
+            ]
+            rows = (
+                # Collapsed rows belong to several sources
+                np.unique(np.concatenate(selected)) if selected
+                else np.empty(0, dtype=np.int64)
+            )
+
+        if page_range is not None:
+            first, last = page_range
+            pages = self.chunks.pages
+
+            if rows is None:
+                rows = np.flatnonzero((pages >= first) & (pages <= last))
+            else:
+                selected_pages = pages[rows]
+                rows = rows[(selected_pages >= first) & (selected_pages <= last)]
+
+        return rows
+
+
+def read_snapshot_manifest(directory: str) -> Optional[Dict]:
+    """
+    Returns the snapshot manifest, or None if no compatible snapshot exists.
+    """
+
+    directory = _resolve_snapshot(Path(directory))
+    if directory is None:
+        return None
+
+    try:
+        with open(directory / "manifest.json", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        # Mid-swap or damaged: treated as missing, so callers rebuild
+        logger.warning(f"Ignoring unreadable snapshot manifest in {directory}: {e}")
+        return None
+
+    if not isinstance(manifest, dict) or manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return None
+
+    return manifest
+
+
+def _aside_path(directory: Path) -> Path:
+    """
+    Where save() moves the previous snapshot while swapping.
+    """
+    return directory.parent / f".{directory.name}.previous"
+
+
+def _resolve_snapshot(directory: Path) -> Optional[Path]:
+    """
+    `directory`, or the snapshot a crashed save() left aside.
+    """
+
+    for candidate in (directory, _aside_path(directory)):
+        if (candidate / "manifest.json").exists():
+            return candidate
+
+    return None
@@ -0,0 +1,248 @@
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.logger import get_logger
+from app.exceptions import RetrievalException
+from app.pipelines.document_rag.loader import get_extraction_pool
+
+logger = get_logger(__name__)
+
+_DOWNLOAD_BLOCK_SIZE = 1 << 16
+
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+# Elements whose content is never page text
+_SKIPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas",
+    "iframe", "nav", "header", "footer", "aside", "button",
+}
+
+# Elements that end a paragraph
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "br", "hr", "li", "ul", "ol",
+    "table", "tr", "td", "th", "blockquote", "pre", "figure", "figcaption",
+    "h1", "h2", "h3", "h4", "h5", "h6", "dd", "dt", "dl",
+}
+
+_INLINE_WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+
+
+class PageFetcher:
+    """
+    Blocking client for search result pages over one pooled, keep-alive
+    requests.Session. Every page is bounded by `timeout` seconds end to
+    end and truncated at `max_bytes`; non-HTML responses are rejected.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        pool_size: int = 8,
+        max_bytes: int = 2 << 20,
+        user_agent: str = "Mozilla/5.0 (compatible; QueryWave/1.0)",
+    ):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_bytes = max_bytes
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str) -> str:
+        """
+        Decoded HTML of `url`.
+        """
+
+        deadline = time.monotonic() + self.timeout
+
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    raise RetrievalException(
+                        message=f"Page request failed with HTTP {response.status_code}: {url}",
+                        error_code="WEB_PAGE_FAILED"
+                    )
+
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type and content_type not in _HTML_TYPES:
+                    raise RetrievalException(
+                        message=f"Page is not HTML ({content_type}): {url}",
+                        error_code="WEB_PAGE_NOT_HTML"
+                    )
+
+                blocks = []
+                size = 0
+                for block in response.iter_content(_DOWNLOAD_BLOCK_SIZE):
+                    if time.monotonic() > deadline:
+                        raise RetrievalException(
+                            message=f"Page request exceeded {self.timeout}s: {url}",
+                            error_code="WEB_PAGE_TIMEOUT"
+                        )
+                    blocks.append(block)
+                    size += len(block)
+                    if size >= self.max_bytes:
+                        break
+
+                body = b"".join(blocks)[:self.max_bytes]
+                return body.decode(response.encoding or "utf-8", errors="replace")
+
+        except requests.Timeout as e:
+            raise RetrievalException(
+                message=f"Page request exceeded {self.timeout}s: {url}",
+                error_code="WEB_PAGE_TIMEOUT"
+            ) from e
+        except requests.RequestException as e:
+            raise RetrievalException(
+                message=f"Page request failed: {e}",
+                error_code="WEB_PAGE_FAILED"
+            ) from e
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# -----------------------------
+# HTML -> text
+# -----------------------------
+
+class _TextExtractor(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Visible text of an HTML page, one paragraph per block element
+    (separated by blank lines) with scripts, styles and page chrome
+    dropped. Runs in the extraction pool.
+    """
+
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.warning(f"Could not fully parse HTML: {e}")
+
+    paragraphs = []
+    for block in "".join(parser.parts).split("\n\n"):
+        lines = (_INLINE_WHITESPACE.sub(" ", line).strip() for line in block.split("\n"))
+        paragraph = " ".join(line for line in lines if line)
+        if paragraph:
+            paragraphs.append(paragraph)
+
+    return "\n\n".join(paragraphs)
+
+
+def fetch_pages(
+    urls: List[str],
+    fetcher: PageFetcher,
+    deadline: float,
+    extract_workers: Optional[int] = None,
+    min_chars: int = 200,
+) -> Dict[str, str]:
+    """
+    Fetches and extracts several pages concurrently. Returns url -> text
+    for the pages that finished within `deadline` seconds overall; pages
+    that failed, were too short (under `min_chars`) or were still
+    pending at the deadline are left out.
+    """
+
+    started = time.perf_counter()
+
+    pages = asyncio.run(_fetch_all(urls, fetcher, deadline, extract_workers, min_chars))
+
+    logger.info(
+        f"Fetched {len(pages)}/{len(urls)} result pages in "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+
+    return pages
+
+
+# -----------------------------
+# Async orchestration
+# -----------------------------
+
+async def _fetch_all(
+    urls: List[str],
+    fetcher: PageFetcher,
+    deadline: float,
+    extract_workers: Optional[int],
+    min_chars: int,
+) -> Dict[str, str]:
+
+    loop = asyncio.get_running_loop()
+
+    # Blocking HTTP runs on threads, one per pooled connection
+    io_pool = ThreadPoolExecutor(max_workers=fetcher.pool_size, thread_name_prefix="web-io")
+
+    workers = extract_workers if extract_workers is not None else os.cpu_count() or 1
+    extract_pool = get_extraction_pool(workers) if workers > 1 else io_pool
+
+    async def fetch_one(url: str) -> Optional[str]:
+        try:
+            html = await loop.run_in_executor(io_pool, fetcher.get, url)
+            text = await loop.run_in_executor(extract_pool, html_to_text, html)
+        except Exception as e:
+            logger.warning(f"Could not fetch result page {url}: {e}")
+            return None
+
+        return text if len(text) >= min_chars else None
+
+    tasks = {asyncio.ensure_future(fetch_one(url)): url for url in urls}
+
+    try:
+        if not tasks:
+            return {}
+
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.info(
+                f"Dropped {len(pending)} result pages that missed the {deadline}s deadline: "
+                + ", ".join(tasks[task] for task in pending)
+            )
+
+        # In result rank order
+        return {
+            url: task.result()
+            for task, url in tasks.items()
+            if task in done and task.result() is not None
+        }
+
+    finally:
+        # Late requests finish (bounded by the fetcher timeout) and are discarded
+        io_pool.shutdown(wait=False, cancel_futures=True)
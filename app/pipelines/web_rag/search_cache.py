@@ -0,0 +1,249 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Trailing punctuation that does not change what is searched for
+_TRAILING = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query used as the cache key: Unicode
+    NFKC, case-folded, whitespace collapsed, trailing punctuation dropped.
+    """
+
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = _WHITESPACE.sub(" ", query).strip()
+    return _TRAILING.sub("", query)
+
+
+class _Flight:
+
+    __slots__ = ("done", "results", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.results: Optional[List[Dict]] = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """
+    TTL cache in front of a search function (query, max_results) ->
+    list of result dicts.
+
+    Results are keyed by normalize_query(query) and max_results, kept in
+    an in-memory LRU and, optionally, a SQLite file that survives
+    restarts. Concurrent misses for the same key are single-flighted:
+    one caller runs the upstream search and the others wait for its
+    result. Empty results and errors are not cached.
+    """
+
+    def __init__(
+        self,
+        search_fn: Callable[..., List[Dict]],
+        ttl_seconds: float = 600.0,
+        memory_items: int = 1024,
+        disk_path: Optional[str] = None,
+    ):
+        self.search_fn = search_fn
+        self.ttl_seconds = ttl_seconds
+        self.memory_items = memory_items
+
+        self._memory: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._db = _open_db(disk_path)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_seconds = 0.0
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        key = f"{max_results}\0{normalize_query(query)}"
+
+        with self._lock:
+            results = self._memory_get(key)
+            if results is not None:
+                self.memory_hits += 1
+                return _copy(results)
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return _copy(flight.results)
+
+        try:
+            stored = self._disk_get(key)
+
+            if stored is not None:
+                results, stored_at = stored
+                # Keeps the row's age, so promotion does not extend the TTL
+                with self._lock:
+                    self.disk_hits += 1
+                    self._memory_put(key, results, stored_at)
+            else:
+                results = self._fetch(key, query, max_results)
+
+            flight.results = results
+            return _copy(results)
+
+        except BaseException as e:
+            flight.error = e
+            raise
+
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _fetch(self, key: str, query: str, max_results: int) -> List[Dict]:
+        with self._lock:
+            self.misses += 1
+
+        started = time.perf_counter()
+        results = self.search_fn(query, max_results=max_results)
+        elapsed = time.perf_counter() - started
+
+        now = time.time()
+        with self._lock:
+            self.upstream_seconds += elapsed
+
+            if results:
+                self._memory_put(key, results, now)
+
+        if results:
+            self._disk_put(key, results, now)
+
+        logger.info(f"Search cache miss for '{query}' ({elapsed * 1000:.0f} ms upstream)")
+        return results
+
+    # -----------------------------
+    # Cache tiers
+    # -----------------------------
+
+    def _memory_get(self, key: str) -> Optional[List[Dict]]:
+        """
+        Caller holds the lock.
+        """
+
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+
+        stored_at, results = entry
+        if time.time() - stored_at > self.ttl_seconds:
+            del self._memory[key]
+            return None
+
+        self._memory.move_to_end(key)
+        return results
+
+    def _memory_put(self, key: str, results: List[Dict], stored_at: float) -> None:
+        """
+        Caller holds the lock.
+        """
+
+        self._memory[key] = (stored_at, results)
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[List[Dict], float]]:
+        """
+        (results, stored_at) of an unexpired row, or None.
+        """
+
+        if self._db is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT results, stored_at FROM search_results WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+
+        return json.loads(row[0]), row[1]
+
+    def _disk_put(self, key: str, results: List[Dict], stored_at: float) -> None:
+        if self._db is None:
+            return
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_results (key, results, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(results), stored_at)
+            )
+            self._db.execute(
+                "DELETE FROM search_results WHERE stored_at < ?",
+                (stored_at - self.ttl_seconds,)
+            )
+            self._db.commit()
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses + self.coalesced
+
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (hits + self.coalesced) / lookups if lookups else 0.0,
+                "entries": len(self._memory),
+                "upstream_seconds": self.upstream_seconds,
+            }
+
+
+def _copy(results: List[Dict]) -> List[Dict]:
+    return [dict(result) for result in results]
+
+
+def _open_db(disk_path: str) -> sqlite3.Connection:
+    path = Path(disk_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    db = sqlite3.connect(str(path), check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS search_results ("
+        "key TEXT PRIMARY KEY, results TEXT NOT NULL, stored_at REAL NOT NULL)"
+    )
+    db.commit()
+
+    logger.info(f"Search disk cache opened at {path}")
+    return db
@@ -1,21 +1,292 @@
-from ddgs import DDGS
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
 from app.utils.logger import get_logger
+from app.exceptions import RetrievalException, StorageException
+from app.pipelines.document_rag.retriever import (
+    DocumentRetriever,
+    read_snapshot_manifest,
+)
+from app.pipelines.web_rag.search_cache import normalize_query
 
 logger = get_logger(__name__)
 
 
-def search_web(query: str, max_results: int = 5):
+# -----------------------------
+# Backends
+# -----------------------------
+#
+# A search backend has search(query, max_results) -> list of
+# {"title", "body", "href"} dicts, best first. The web pipeline only
+# talks to this interface, so it can run against the live engine, a
+# local corpus or a recorded fixture.
+
+
+class DuckDuckGoBackend:
+    """
+    Live DuckDuckGo text search.
+    """
+
+    name = "duckduckgo"
+
+    def __init__(self, timeout: Optional[int] = 10):
+        self.timeout = timeout
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        # Imported here so offline backends work without ddgs installed
+        from ddgs import DDGS
+
+        logger.info(f"Searching DuckDuckGo for: {query}")
+
+        results = []
+
+        with DDGS(timeout=self.timeout) as ddgs:
+            for r in ddgs.text(query, max_results=max_results):
+                results.append({
+                    "title": r.get("title"),
+                    "body": r.get("body"),
+                    "href": r.get("href")
+                })
+
+        return results
+
+
+class LocalCorpusBackend:
+    """
+    Offline search over a JSONL corpus of {"title", "body", "href"}
+    records ("text" and "url" are accepted too), ranked by the same
+    hybrid BM25 + vector retriever as uploaded documents. Each record
+    is indexed whole, as one chunk.
+
+    With `snapshot_dir` set the index is saved under a key of the
+    corpus file's hash and reopened on the next start.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        corpus_path: str,
+        embedding_model,
+        snapshot_dir: Optional[str] = None,
+        retriever_config: Optional[Dict] = None,
+    ):
+        self.corpus_path = Path(corpus_path)
+        self.records = _read_corpus(self.corpus_path)
+
+        snapshot_path = None
+        if snapshot_dir:
+            digest = hashlib.sha256(self.corpus_path.read_bytes()).hexdigest()[:16]
+            snapshot_path = Path(snapshot_dir) / f"corpus-{digest}"
+
+        self.retriever = None
+        if snapshot_path is not None and read_snapshot_manifest(snapshot_path):
+            try:
+                self.retriever = DocumentRetriever.load(
+                    snapshot_path, embedding_model, config=retriever_config
+                )
+            except StorageException as e:
+                logger.warning(f"Ignoring unusable corpus snapshot {snapshot_path}: {e}")
+
+        if self.retriever is None:
+            self.retriever = DocumentRetriever(embedding_model, config=retriever_config)
+            self.retriever.add_chunks(
+                {
+                    "source": record["href"],
+                    "chunk_id": i,
+                    "text": f"{record['title']}\n\n{record['body']}",
+                }
+                for i, record in enumerate(self.records)
+            )
+
+            if snapshot_path is not None:
+                try:
+                    self.retriever.save(snapshot_path)
+                except OSError as e:
+                    logger.warning(f"Could not write corpus snapshot {snapshot_path}: {e}")
+
+        logger.info(f"Local search corpus {self.corpus_path} ready ({len(self.records)} records)")
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        hits = self.retriever.retrieve(query, top_k=max_results)
+        return [dict(self.records[hit["chunk_id"]]) for hit in hits]
+
+
+class ReplayBackend:
+    """
+    Serves results recorded in a JSON fixture ({normalized query:
+    results}). With `record_from` set, queries missing from the fixture
+    are searched there and written back, so a session against the live
+    engine produces the fixture that later runs replay. Without it a
+    missing query returns no results, or raises when `strict`.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        fixture_path: str,
+        record_from=None,
+        strict: bool = False,
+    ):
+        self.fixture_path = Path(fixture_path)
+        self.record_from = record_from
+        self.strict = strict
+
+        self._lock = threading.Lock()
+
+        try:
+            with open(self.fixture_path, encoding="utf-8") as f:
+                self.fixture: Dict[str, List[Dict]] = json.load(f)
+        except FileNotFoundError:
+            if record_from is None:
+                raise RetrievalException(
+                    message=f"Search fixture not found: {self.fixture_path}",
+                    error_code="WEB_FIXTURE_NOT_FOUND"
+                )
+            self.fixture = {}
+        except ValueError as e:
+            raise RetrievalException(
+                message=f"Malformed search fixture {self.fixture_path}: {e}",
+                error_code="WEB_FIXTURE_INVALID"
+            ) from e
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        key = normalize_query(query)
+
+        with self._lock:
+            recorded = self.fixture.get(key)
+
+        if recorded is not None and (
+            len(recorded) >= max_results or self.record_from is None
+        ):
+            return [dict(result) for result in recorded[:max_results]]
+
+        if self.record_from is None:
+            if self.strict:
+                raise RetrievalException(
+                    message=f"No recorded search results for: {query}",
+                    error_code="WEB_FIXTURE_MISSING"
+                )
+            return []
+
+        results = self.record_from.search(query, max_results=max_results)
+
+        with self._lock:
+            self.fixture[key] = results
+            self._write_fixture()
+
+        return [dict(result) for result in results]
+
+    def _write_fixture(self) -> None:
+        """
+        Caller holds the lock.
+        """
+
+        self.fixture_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.fixture_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.fixture, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.fixture_path)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            logger.warning(f"Could not write search fixture {self.fixture_path}: {e}")
+
+
+def build_search_backend(config: Optional[Dict] = None, embedding_model=None):
+    """
+    Returns the backend named by the `web_search` config block's
+    `backend` key: "duckduckgo" (default), "local" or "replay".
+    """
+
+    config = config or {}
+    kind = config.get("backend", "duckduckgo")
+
+    if kind == "duckduckgo":
+        return DuckDuckGoBackend(timeout=config.get("timeout", 10))
+
+    if kind == "local":
+        local_config = config.get("local", {})
+        if not local_config.get("corpus_path"):
+            raise RetrievalException(
+                message="web_search.local.corpus_path is required for the local backend",
+                error_code="WEB_BACKEND_MISCONFIGURED"
+            )
+
+        return LocalCorpusBackend(
+            local_config["corpus_path"],
+            embedding_model,
+            snapshot_dir=local_config.get("snapshot_dir"),
+            retriever_config=local_config.get("retriever"),
+        )
+
+    if kind == "replay":
+        replay_config = config.get("replay", {})
+        if not replay_config.get("fixture_path"):
+            raise RetrievalException(
+                message="web_search.replay.fixture_path is required for the replay backend",
+                error_code="WEB_BACKEND_MISCONFIGURED"
+            )
+
+        return ReplayBackend(
+            replay_config["fixture_path"],
+            record_from=(
+                DuckDuckGoBackend(timeout=config.get("timeout", 10))
+                if replay_config.get("record", False) else None
+            ),
+            strict=replay_config.get("strict", False),
+        )
+
+    raise RetrievalException(
+        message=f"Unknown web search backend: {kind}",
+        error_code="WEB_BACKEND_UNKNOWN"
+    )
+
+
+# -----------------------------
+# Corpus
+# -----------------------------
+
+def _read_corpus(corpus_path: Path) -> List[Dict]:
+    records = []
+
+    try:
+        with open(corpus_path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    raw = json.loads(line)
+                except ValueError as e:
+                    raise RetrievalException(
+                        message=f"Malformed corpus record at {corpus_path}:{line_number}: {e}",
+                        error_code="WEB_CORPUS_INVALID"
+                    ) from e
 
-    logger.info(f"Searching DuckDuckGo for: {query}")
+                records.append({
+                    "title": raw.get("title") or "",
+                    "body": raw.get("body") or raw.get("text") or "",
+                    "href": raw.get("href") or raw.get("url") or f"local:{len(records)}",
+                })
 
-    results = []
+    except OSError as e:
+        raise RetrievalException(
+            message=f"Cannot read search corpus {corpus_path}: {e}",
+            error_code="WEB_CORPUS_NOT_FOUND"
+        ) from e
 
-    with DDGS() as ddgs:
-        for r in ddgs.text(query, max_results=max_results):
-            results.append({
-                "title": r.get("title"),
-                "body": r.get("body"),
-                "href": r.get("href")
-            })
+    if not records:
+        raise RetrievalException(
+            message=f"Search corpus {corpus_path} is empty",
+            error_code="WEB_CORPUS_EMPTY"
+        )
 
-    return results
+    return records
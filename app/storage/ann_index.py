@@ -0,0 +1,206 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_ASSIGN_BLOCK = 8192
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file ANN index over normalized vectors.
+
+    Rows are clustered with spherical k-means into `nlist` lists. A query
+    only scans the rows of its `nprobe` closest lists, so search cost is
+    roughly nprobe / nlist of a brute-force scan.
+
+    The index stores row ids only; the vectors stay in the VectorStore,
+    which scores the returned candidates.
+    """
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        kmeans_iters: int = 10,
+        train_sample_size: int = 65536,
+        seed: int = 0,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iters = kmeans_iters
+        self.train_sample_size = train_sample_size
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self._list_rows = np.empty(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+
+        # Rows added after build(), kept outside the CSR lists
+        self._extra_rows = np.empty(0, dtype=np.int64)
+        self._extra_lists = np.empty(0, dtype=np.int32)
+
+    @property
+    def indexed_count(self) -> int:
+        return len(self._list_rows)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._extra_rows)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+
+    def build(self, vectors: np.ndarray) -> None:
+        """
+        Trains centroids on a sample of `vectors` and assigns every row.
+        """
+
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        rng = np.random.default_rng(self.seed)
+
+        if n > self.train_sample_size:
+            sample = vectors[rng.choice(n, self.train_sample_size, replace=False)]
+        else:
+            sample = vectors
+
+        self.centroids = _spherical_kmeans(
+            np.asarray(sample, dtype=np.float32),
+            nlist,
+            self.kmeans_iters,
+            rng,
+        )
+
+        assignments = self._assign(vectors)
+
+        self._list_rows = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        self._extra_rows = np.empty(0, dtype=np.int64)
+        self._extra_lists = np.empty(0, dtype=np.int32)
+
+        logger.info(f"IVF index built: {n} rows in {nlist} lists")
+
+    def add(self, vectors: np.ndarray, start_row: int) -> None:
+        """
+        Assigns newly appended rows to their nearest existing list.
+        """
+
+        rows = np.arange(start_row, start_row + len(vectors), dtype=np.int64)
+
+        self._extra_rows = np.concatenate((self._extra_rows, rows))
+        self._extra_lists = np.concatenate(
+            (self._extra_lists, self._assign(vectors))
+        )
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+
+        for start in range(0, len(vectors), _ASSIGN_BLOCK):
+            block = vectors[start:start + _ASSIGN_BLOCK]
+            assignments[start:start + len(block)] = np.argmax(
+                block @ self.centroids.T, axis=1
+            )
+
+        return assignments
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            "centroids": self.centroids,
+            "list_rows": self._list_rows,
+            "list_offsets": self._list_offsets,
+            "extra_rows": self._extra_rows,
+            "extra_lists": self._extra_lists,
+        }
+
+    @classmethod
+    def restore(cls, state: Dict[str, np.ndarray], nprobe: int = 8) -> "IVFFlatIndex":
+        """
+        Rebuilds a trained index from state(); no k-means is run.
+        """
+
+        centroids = state["centroids"]
+
+        index = cls(nlist=len(centroids), nprobe=nprobe)
+        index.centroids = centroids
+        index._list_rows = state["list_rows"]
+        index._list_offsets = state["list_offsets"]
+        index._extra_rows = state["extra_rows"]
+        index._extra_lists = state["extra_lists"]
+
+        return index
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Returns the row ids stored in the lists closest to `query`.
+        """
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+
+        parts = [
+            self._list_rows[self._list_offsets[p]:self._list_offsets[p + 1]]
+            for p in probes
+        ]
+
+        if len(self._extra_rows):
+            parts.append(self._extra_rows[np.isin(self._extra_lists, probes)])
+
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def _spherical_kmeans(
+    sample: np.ndarray,
+    nlist: int,
+    iters: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    K-means on the unit sphere: assign by dot product, renormalize means.
+    """
+
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        assignments = np.empty(len(sample), dtype=np.int64)
+        for start in range(0, len(sample), _ASSIGN_BLOCK):
+            block = sample[start:start + _ASSIGN_BLOCK]
+            assignments[start:start + len(block)] = np.argmax(
+                block @ centroids.T, axis=1
+            )
+
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        filled = np.flatnonzero(counts)
+
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+
+        # Re-seed empty lists from random sample rows
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty))]
+
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+
+    return centroids
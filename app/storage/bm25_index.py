@@ -0,0 +1,634 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.logger import get_logger
+from app.exceptions import StorageException
+
+logger = get_logger(__name__)
+
+_POSTING_ARRAYS = ("term_offsets", "doc_ids", "term_freqs")
+
+# Rough cost of one binary-search probe relative to one posting scanned
+_PROBE_COST = 16
+
+
+class _PostingsSegment:
+    """
+    CSR postings for one batch of documents: the documents containing
+    term `t` are doc_ids[term_offsets[t]:term_offsets[t + 1]].
+    Terms interned after the segment was built have no postings in it.
+    """
+
+    __slots__ = _POSTING_ARRAYS
+
+    def __init__(self, term_offsets: np.ndarray, doc_ids: np.ndarray, term_freqs: np.ndarray):
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+
+    @property
+    def num_terms(self) -> int:
+        return len(self.term_offsets) - 1
+
+    def postings(self, term: int):
+        if term >= self.num_terms:
+            return None
+        start, end = self.term_offsets[term], self.term_offsets[term + 1]
+        if start == end:
+            return None
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def pairs(self):
+        """
+        Expands CSR back to flat (term, doc, tf) arrays.
+        """
+        counts = np.diff(self.term_offsets)
+        terms = np.repeat(np.arange(self.num_terms, dtype=np.int64), counts)
+        return terms, self.doc_ids, self.term_freqs
+
+    @classmethod
+    def from_pairs(
+        cls,
+        terms: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        num_terms: int,
+    ) -> "_PostingsSegment":
+
+        order = np.lexsort((docs, terms))
+        counts = np.bincount(terms, minlength=num_terms)
+
+        return cls(
+            term_offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            doc_ids=docs[order].astype(np.int32),
+            term_freqs=tfs[order].astype(np.float32),
+        )
+
+
+class BM25Index:
+    """
+    Array-backed Okapi BM25 index.
+
+    Postings are kept in CSR segments; documents can be appended and
+    removed without re-tokenizing the rest of the corpus. Removed
+    documents are tombstoned until compact(). Scores match
+    rank_bm25.BM25Okapi over the live documents.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.vocab: Dict[str, int] = {}
+        self.segments: List[_PostingsSegment] = []
+
+        self.df = np.zeros(0, dtype=np.int64)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self._has_tombstones = False
+
+        # Derived from df / doc_len; recomputed lazily after any change
+        self._idf: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._upper_bounds: Optional[np.ndarray] = None
+
+    @property
+    def num_docs(self) -> int:
+        """
+        Total rows, including tombstoned ones.
+        """
+        return len(self.doc_len)
+
+    @property
+    def corpus_size(self) -> int:
+        return int(self.live.sum())
+
+    @property
+    def avgdl(self) -> float:
+        live_len = self.doc_len[self.live]
+        return float(live_len.mean()) if len(live_len) else 0.0
+
+    @property
+    def idf(self) -> np.ndarray:
+        if self._idf is None:
+            self._idf = _okapi_idf(self.df, self.corpus_size, self.epsilon)
+        return self._idf
+
+    @property
+    def norms(self) -> np.ndarray:
+        """
+        Per-document length norm k1 * (1 - b + b * dl / avgdl).
+        """
+        if self._norms is None:
+            self._norms = (
+                self.k1 * (1 - self.b + self.b * self.doc_len / (self.avgdl or 1.0))
+            ).astype(np.float32)
+        return self._norms
+
+    @property
+    def upper_bounds(self) -> np.ndarray:
+        """
+        Per-term maximum contribution of one query occurrence to any
+        document's score, used for MaxScore pruning.
+        """
+
+        if self._upper_bounds is None:
+            max_saturation = np.zeros(len(self.vocab), dtype=np.float32)
+            norms = self.norms
+
+            for segment in self.segments:
+                if not len(segment.doc_ids):
+                    continue
+
+                tf = segment.term_freqs
+                saturation = tf * (self.k1 + 1) / (tf + norms[segment.doc_ids])
+
+                counts = np.diff(segment.term_offsets)
+                present = np.flatnonzero(counts)
+                segment_max = np.maximum.reduceat(
+                    saturation, segment.term_offsets[present]
+                )
+                np.maximum.at(max_saturation, present, segment_max)
+
+            # Negative idf can only lower a score; bound it by zero
+            self._upper_bounds = np.maximum(self.idf, 0.0) * max_saturation
+
+        return self._upper_bounds
+
+    def _invalidate_stats(self) -> None:
+        self._idf = None
+        self._norms = None
+        self._upper_bounds = None
+
+    def memory_bytes(self) -> int:
+        """
+        Heap bytes held by the index; memory-mapped postings are excluded.
+        """
+
+        arrays = [self.df, self.doc_len, self.live]
+        for segment in self.segments:
+            arrays.extend((segment.term_offsets, segment.doc_ids, segment.term_freqs))
+
+        return sum(a.nbytes for a in arrays if not isinstance(a, np.memmap))
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+
+    @classmethod
+    def build(
+        cls,
+        tokenized_corpus: Sequence[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+
+        index = cls(k1=k1, b=b, epsilon=epsilon)
+        index.add_documents(tokenized_corpus)
+        return index
+
+    def add_documents(self, tokenized_docs: Sequence[List[str]]) -> np.ndarray:
+        """
+        Appends documents as a new postings segment.
+        Returns the row ids assigned to them.
+        """
+
+        first_row = self.num_docs
+        rows = np.arange(first_row, first_row + len(tokenized_docs), dtype=np.int64)
+
+        if not len(tokenized_docs):
+            return rows
+
+        term_ids: List[int] = []
+        doc_rows: List[int] = []
+        doc_len = np.empty(len(tokenized_docs), dtype=np.float32)
+
+        for offset, tokens in enumerate(tokenized_docs):
+            doc_len[offset] = len(tokens)
+            for token in tokens:
+                term_ids.append(self.vocab.setdefault(token, len(self.vocab)))
+            doc_rows.extend([first_row + offset] * len(tokens))
+
+        # One (term, doc) pair per token; collapse to postings with tf
+        stride = first_row + len(tokenized_docs)
+        pairs = np.asarray(term_ids, dtype=np.int64) * stride
+        pairs += np.asarray(doc_rows, dtype=np.int64)
+        keys, tfs = np.unique(pairs, return_counts=True)
+
+        terms = keys // stride
+        docs = keys % stride
+
+        self.segments.append(
+            _PostingsSegment.from_pairs(terms, docs, tfs, len(self.vocab))
+        )
+
+        self.df = np.concatenate(
+            (self.df, np.zeros(len(self.vocab) - len(self.df), dtype=np.int64))
+        )
+        self.df += np.bincount(terms, minlength=len(self.vocab))
+
+        self.doc_len = np.concatenate((self.doc_len, doc_len))
+        self.live = np.concatenate((self.live, np.ones(len(doc_len), dtype=bool)))
+        self._invalidate_stats()
+
+        self._merge_tail()
+
+        return rows
+
+    def remove(self, rows: np.ndarray) -> None:
+        """
+        Tombstones documents and removes them from the term statistics.
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[self.live[rows]]
+
+        if not len(rows):
+            return
+
+        removed = np.zeros(self.num_docs, dtype=bool)
+        removed[rows] = True
+
+        for segment in self.segments:
+            terms, docs, _ = segment.pairs()
+            self.df -= np.bincount(terms[removed[docs]], minlength=len(self.df))
+
+        self.live[rows] = False
+        self._has_tombstones = True
+        self._invalidate_stats()
+
+    def compact(self, keep: np.ndarray) -> None:
+        """
+        Drops every row not in `keep` (sorted row ids) and renumbers the
+        survivors 0..len(keep)-1, merging all segments into one.
+        """
+
+        remap = np.full(self.num_docs, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+
+        terms, docs, tfs = self._all_pairs()
+        mask = remap[docs] >= 0
+
+        self.segments = [
+            _PostingsSegment.from_pairs(
+                terms[mask], remap[docs[mask]], tfs[mask], len(self.vocab)
+            )
+        ]
+        self.doc_len = self.doc_len[keep]
+        self.live = self.live[keep]
+        self._has_tombstones = not self.live.all()
+        self._invalidate_stats()
+
+    def _merge_tail(self) -> None:
+        """
+        Log-structured merge: while the newest segment is at least half
+        the size of the one before it, merge the two. Keeps the segment
+        count logarithmic when documents arrive in many small batches.
+        """
+
+        while len(self.segments) > 1:
+            newest, previous = self.segments[-1], self.segments[-2]
+            if 2 * len(newest.doc_ids) < len(previous.doc_ids):
+                break
+
+            parts = [previous.pairs(), newest.pairs()]
+            terms, docs, tfs = (np.concatenate(arrays) for arrays in zip(*parts))
+
+            self.segments[-2:] = [
+                _PostingsSegment.from_pairs(terms, docs, tfs, len(self.vocab))
+            ]
+
+    def _merge_segments(self) -> None:
+        terms, docs, tfs = self._all_pairs()
+        self.segments = [
+            _PostingsSegment.from_pairs(terms, docs, tfs, len(self.vocab))
+        ]
+
+    def _all_pairs(self):
+        if not self.segments:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty.astype(np.float32)
+
+        parts = [segment.pairs() for segment in self.segments]
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+
+    def get_scores(self, query_tokens: Sequence[str]) -> np.ndarray:
+        """
+        BM25 score of every row for the query; tombstoned rows score -inf.
+        Touches every row, so prefer top_k() on the query path.
+        """
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+
+        for term, weight in self._query_terms(query_tokens):
+            docs, contributions = self._term_contributions(term, weight, False)
+            scores[docs] += contributions
+
+        scores[~self.live] = -np.inf
+        return scores
+
+    def top_k(
+        self,
+        query_tokens: Sequence[str],
+        k: int,
+        rows: Optional[np.ndarray] = None,
+    ):
+        """
+        Returns (row_ids, scores) of the k best live rows, best first.
+        `rows` (sorted row ids) restricts the search to a subset; see
+        _top_k_within().
+
+        Term-at-a-time MaxScore: terms are processed by decreasing upper
+        bound. Once the bounds of the remaining terms cannot lift an
+        unseen document past the current k-th best score, the remaining
+        postings are only probed for existing candidates, and candidates
+        that can no longer reach the threshold are dropped. Cost scales
+        with the postings of the query terms, not with corpus size.
+        """
+
+        terms = self._query_terms(query_tokens)
+        if not terms or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if rows is not None:
+            return self._top_k_within(terms, k, np.asarray(rows, dtype=np.int64))
+
+        idf = self.idf
+        if any(idf[term] < 0 for term, _ in terms):
+            # Negative contributions break the threshold's lower-bound
+            # guarantee; score exhaustively (only on tiny corpora)
+            return _best_of(np.arange(self.num_docs), self.get_scores(query_tokens), k)
+
+        bounds = self.upper_bounds
+        terms.sort(key=lambda tw: bounds[tw[0]] * tw[1], reverse=True)
+
+        term_bounds = np.array([bounds[t] * w for t, w in terms], dtype=np.float32)
+        remaining = np.concatenate((np.cumsum(term_bounds[::-1])[::-1], [0.0]))
+
+        # Essential phase: merge full postings into sorted candidate
+        # arrays, sized by the postings touched rather than the corpus
+        cand_docs = np.empty(0, dtype=np.int64)
+        cand_scores = np.empty(0, dtype=np.float32)
+        threshold = -np.inf
+
+        live_only = self._has_tombstones
+
+        i = 0
+        while i < len(terms) and not remaining[i] < threshold:
+            docs, contributions = self._term_contributions(*terms[i], live_only)
+
+            cand_docs, inverse = np.unique(
+                np.concatenate((cand_docs, docs)), return_inverse=True
+            )
+            cand_scores = np.bincount(
+                inverse,
+                weights=np.concatenate((cand_scores, contributions)),
+                minlength=len(cand_docs),
+            ).astype(np.float32)
+            i += 1
+
+            # Scores only grow, so the k-th best among this term's docs
+            # is a valid (cheap) lower bound for the final k-th score
+            if i < len(terms):
+                term_scores = cand_scores[inverse[len(inverse) - len(docs):]]
+                threshold = max(threshold, _kth_best(term_scores, k))
+
+        # Non-essential phase: probe the remaining terms for candidates only
+        for term, weight in terms[i:]:
+            viable = cand_scores + remaining[i] >= threshold
+            cand_docs, cand_scores = cand_docs[viable], cand_scores[viable]
+
+            if len(cand_docs) * _PROBE_COST < self._postings_length(term):
+                cand_scores = cand_scores + self._probe(term, weight, cand_docs)
+            else:
+                # Too many candidates for binary search per candidate;
+                # locate the postings among the candidates instead
+                docs, contributions = self._term_contributions(
+                    term, weight, live_only
+                )
+                if len(cand_docs):
+                    pos = np.minimum(np.searchsorted(cand_docs, docs), len(cand_docs) - 1)
+                    hit = cand_docs[pos] == docs
+                    cand_scores[pos[hit]] += contributions[hit]
+
+            threshold = _kth_best(cand_scores, k)
+            i += 1
+
+        return _best_of(cand_docs, cand_scores, k)
+
+    def _top_k_within(self, terms, k: int, rows: np.ndarray):
+        """
+        Scores only `rows`: each term's postings are intersected with the
+        row subset by binary search in whichever direction is cheaper,
+        so work scales with the subset, not the corpus.
+        """
+
+        rows = rows[self.live[rows]]
+        scores = np.zeros(len(rows), dtype=np.float32)
+        matched = np.zeros(len(rows), dtype=bool)
+
+        for term, weight in terms:
+            if len(rows) * _PROBE_COST < self._postings_length(term):
+                contributions = self._probe(term, weight, rows)
+                scores += contributions
+                matched |= contributions != 0
+                continue
+
+            docs, contributions = self._term_contributions(term, weight, False)
+            if not len(rows):
+                break
+
+            pos = np.searchsorted(rows, docs)
+            pos_clipped = np.minimum(pos, len(rows) - 1)
+            hit = rows[pos_clipped] == docs
+
+            scores[pos_clipped[hit]] += contributions[hit]
+            matched[pos_clipped[hit]] = True
+
+        return _best_of(rows[matched], scores[matched], k)
+
+    def _query_terms(self, query_tokens: Sequence[str]):
+        """
+        Known query terms as [term_id, occurrence count] pairs.
+        """
+
+        counts: Dict[int, int] = {}
+        for token in query_tokens:
+            term = self.vocab.get(token)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+
+        return [[term, weight] for term, weight in counts.items()]
+
+    def _term_contributions(self, term: int, weight: int, live_only: bool = True):
+        """
+        (doc ids, score contributions) over every posting of `term`.
+        Dead rows are dropped when `live_only` is set.
+        """
+
+        docs_parts, tf_parts = [], []
+        for segment in self.segments:
+            postings = segment.postings(term)
+            if postings is not None:
+                docs_parts.append(postings[0])
+                tf_parts.append(postings[1])
+
+        if not docs_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        docs = np.concatenate(docs_parts) if len(docs_parts) > 1 else docs_parts[0]
+        tf = np.concatenate(tf_parts) if len(tf_parts) > 1 else tf_parts[0]
+
+        if live_only:
+            keep = self.live[docs]
+            docs, tf = docs[keep], tf[keep]
+
+        scale = float(weight * self.idf[term] * (self.k1 + 1))
+        return docs, scale * tf / (tf + self.norms[docs])
+
+    def _postings_length(self, term: int) -> int:
+        return sum(
+            int(segment.term_offsets[term + 1] - segment.term_offsets[term])
+            for segment in self.segments
+            if term + 1 < len(segment.term_offsets)
+        )
+
+    def _probe(self, term: int, weight: int, docs: np.ndarray) -> np.ndarray:
+        """
+        Contributions of `term` to the given (sorted) docs, found by
+        binary search in each segment's sorted postings.
+        """
+
+        contributions = np.zeros(len(docs), dtype=np.float32)
+
+        for segment in self.segments:
+            postings = segment.postings(term)
+            if postings is None:
+                continue
+
+            posting_docs, tf = postings
+            pos = np.searchsorted(posting_docs, docs)
+            pos_clipped = np.minimum(pos, len(posting_docs) - 1)
+            hit = posting_docs[pos_clipped] == docs
+
+            hit_tf = tf[pos_clipped[hit]]
+            scale = float(weight * self.idf[term] * (self.k1 + 1))
+            contributions[hit] += scale * hit_tf / (hit_tf + self.norms[docs[hit]])
+
+        return contributions
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def save(self, directory: Path) -> None:
+        """
+        Writes merged postings as bm25_*.npy arrays plus bm25_vocab.json.
+        """
+
+        directory = Path(directory)
+
+        if len(self.segments) != 1:
+            self._merge_segments()
+
+        segment = self.segments[0]
+        arrays = {
+            "term_offsets": segment.term_offsets,
+            "doc_ids": segment.doc_ids,
+            "term_freqs": segment.term_freqs,
+            "df": self.df,
+            "doc_len": self.doc_len,
+            "live": self.live,
+        }
+
+        for name, array in arrays.items():
+            np.save(directory / f"bm25_{name}.npy", array)
+
+        with open(directory / "bm25_vocab.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "epsilon": self.epsilon, "vocab": self.vocab},
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "BM25Index":
+        directory = Path(directory)
+        mmap_mode = "r" if mmap else None
+
+        try:
+            with open(directory / "bm25_vocab.json", encoding="utf-8") as f:
+                header = json.load(f)
+
+            postings = {
+                name: np.load(directory / f"bm25_{name}.npy", mmap_mode=mmap_mode)
+                for name in _POSTING_ARRAYS
+            }
+            stats = {
+                name: np.load(directory / f"bm25_{name}.npy")
+                for name in ("df", "doc_len", "live")
+            }
+        except (OSError, ValueError) as e:
+            raise StorageException(
+                message=f"Failed to load BM25 index from {directory}",
+                error_code="BM25_LOAD_FAILED"
+            ) from e
+
+        index = cls(k1=header["k1"], b=header["b"], epsilon=header["epsilon"])
+        index.vocab = header["vocab"]
+        index.segments = [_PostingsSegment(**postings)]
+        index.df = stats["df"]
+        index.doc_len = stats["doc_len"]
+        index.live = stats["live"]
+        index._has_tombstones = not index.live.all()
+
+        return index
+
+
+def _kth_best(scores: np.ndarray, k: int) -> float:
+    if len(scores) < k:
+        return -np.inf
+    return float(np.partition(scores, len(scores) - k)[-k])
+
+
+def _best_of(row_ids: np.ndarray, scores: np.ndarray, k: int):
+    """
+    The k highest-scoring finite (live) entries, best first.
+    """
+
+    finite = np.isfinite(scores)
+    row_ids, scores = row_ids[finite], scores[finite]
+
+    if k < len(scores):
+        best = np.argpartition(scores, len(scores) - k)[-k:]
+    else:
+        best = np.arange(len(scores))
+
+    best = best[np.argsort(scores[best], kind="stable")[::-1]]
+    return row_ids[best], scores[best]
+
+
+def _okapi_idf(df: np.ndarray, corpus_size: int, epsilon: float) -> np.ndarray:
+    """
+    BM25Okapi idf over terms that still occur; negative values are
+    floored at epsilon * mean idf.
+    """
+
+    idf = (np.log(corpus_size - df + 0.5) - np.log(df + 0.5)).astype(np.float32)
+
+    present = df > 0
+    if present.any():
+        floor = epsilon * float(idf[present].mean())
+        idf[present & (idf < 0)] = floor
+
+    idf[~present] = 0.0
+    return idf
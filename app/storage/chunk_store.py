@@ -0,0 +1,254 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.utils.logger import get_logger
+from app.exceptions import StorageException
+
+logger = get_logger(__name__)
+
+# One row per indexed chunk; text lives once per document in `documents`
+CHUNK_DTYPE = np.dtype([
+    ("doc", np.int32),
+    ("start", np.int64),
+    ("end", np.int64),
+    ("source", np.int32),
+    ("chunk_id", np.int32),
+    ("page", np.int32),
+])
+
+NO_PAGE = -1
+
+
+class ChunkStore:
+    """
+    Row-aligned chunk records as (doc, start, end) offsets.
+
+    Each document's text is stored once; a chunk is a row of a NumPy
+    structured array pointing into it, plus interned source / chunk id /
+    page columns. Chunk text and metadata dicts are only materialized on
+    request, i.e. for the final top-k of a query.
+
+    Rows collapsed by deduplication keep their extra source locations
+    in a sparse `locations` map.
+    """
+
+    __slots__ = ("documents", "source_names", "_source_ids", "_rows", "_size", "locations")
+
+    def __init__(self, initial_capacity: int = 1024):
+        self.documents: List[str] = []
+        self.source_names: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+
+        self._rows = np.zeros(initial_capacity, dtype=CHUNK_DTYPE)
+        self._size = 0
+
+        # row -> [{"source", "chunk_id", "page"?}, ...]
+        self.locations: Dict[int, List[Dict]] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows[:self._size]
+
+    @property
+    def pages(self) -> np.ndarray:
+        return self.rows["page"]
+
+    def memory_bytes(self) -> int:
+        text_bytes = sum(len(text) for text in self.documents)
+        return int(text_bytes + self.rows.nbytes)
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+
+    def add_document(self, text: str) -> int:
+        self.documents.append(text)
+        return len(self.documents) - 1
+
+    def source_id(self, source: str) -> int:
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = len(self.source_names)
+            self.source_names.append(source)
+            self._source_ids[source] = source_id
+        return source_id
+
+    def append(self, chunks: List[Dict]) -> int:
+        """
+        Appends chunk records ({"doc", "start", "end", "source",
+        "chunk_id", optional "page" / "locations"}) and returns the
+        first new row id.
+        """
+
+        first_row = self._size
+        end = first_row + len(chunks)
+
+        if end > len(self._rows):
+            grown = np.zeros(max(end, 2 * len(self._rows)), dtype=CHUNK_DTYPE)
+            grown[:self._size] = self.rows
+            self._rows = grown
+
+        block = self._rows[first_row:end]
+        block["doc"] = [chunk["doc"] for chunk in chunks]
+        block["start"] = [chunk["start"] for chunk in chunks]
+        block["end"] = [chunk["end"] for chunk in chunks]
+        block["source"] = [self.source_id(chunk["source"]) for chunk in chunks]
+        block["chunk_id"] = [chunk["chunk_id"] for chunk in chunks]
+        block["page"] = [chunk.get("page", NO_PAGE) for chunk in chunks]
+
+        for offset, chunk in enumerate(chunks):
+            if chunk.get("locations"):
+                self.locations[first_row + offset] = chunk["locations"]
+
+        self._size = end
+        return first_row
+
+    def relabel(self, row: int, location: Dict, locations: List[Dict]) -> None:
+        """
+        Points a collapsed row at another of its locations.
+        """
+
+        if not self._rows.flags.writeable:
+            self._rows = np.array(self._rows)
+
+        record = self._rows[row]
+        record["source"] = self.source_id(location["source"])
+        record["chunk_id"] = location["chunk_id"]
+        record["page"] = location.get("page", NO_PAGE)
+        self.locations[row] = locations
+
+    def compact(self, keep: np.ndarray) -> None:
+        """
+        Keeps only the rows in `keep` (sorted row ids) and drops
+        documents no remaining row points into.
+        """
+
+        keep = np.asarray(keep, dtype=np.int64)
+        rows = self.rows[keep]
+
+        used_docs, doc_index = np.unique(rows["doc"], return_inverse=True)
+        rows["doc"] = doc_index
+        self.documents = [self.documents[i] for i in used_docs]
+
+        remap = {int(old): new for new, old in enumerate(keep)}
+        self.locations = {
+            remap[row]: locations
+            for row, locations in self.locations.items()
+            if row in remap
+        }
+
+        self._rows = rows
+        self._size = len(rows)
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+
+    def text(self, row: int) -> str:
+        record = self._rows[row]
+        return self.documents[record["doc"]][record["start"]:record["end"]]
+
+    def source(self, row: int) -> str:
+        return self.source_names[self._rows[row]["source"]]
+
+    def sources_of(self, row: int) -> List[str]:
+        """
+        Every source a (possibly collapsed) row appears in.
+        """
+
+        locations = self.locations.get(row)
+        if not locations:
+            return [self.source(row)]
+        return list(dict.fromkeys(location["source"] for location in locations))
+
+    def metadata(self, row: int) -> Dict:
+        """
+        Materializes the chunk dict ({"source", "chunk_id", "text",
+        optional "page" / "locations"}) for one row.
+        """
+
+        record = self._rows[row]
+        metadata = {
+            "source": self.source_names[record["source"]],
+            "chunk_id": int(record["chunk_id"]),
+            "text": self.text(row),
+        }
+
+        if record["page"] != NO_PAGE:
+            metadata["page"] = int(record["page"])
+
+        if row in self.locations:
+            metadata["locations"] = self.locations[row]
+
+        return metadata
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+
+        np.save(directory / "chunk_rows.npy", self.rows)
+
+        with open(directory / "chunk_documents.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "documents": self.documents,
+                    "sources": self.source_names,
+                    "locations": {str(row): loc for row, loc in self.locations.items()},
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "ChunkStore":
+        directory = Path(directory)
+
+        try:
+            rows = np.load(directory / "chunk_rows.npy", mmap_mode="r" if mmap else None)
+            with open(directory / "chunk_documents.json", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            raise StorageException(
+                message=f"Failed to load chunks from {directory}",
+                error_code="CHUNK_LOAD_FAILED"
+            ) from e
+
+        store = cls(initial_capacity=0)
+        store._rows = rows
+        store._size = len(rows)
+        store.documents = state["documents"]
+        store.source_names = state["sources"]
+        store._source_ids = {name: i for i, name in enumerate(store.source_names)}
+        store.locations = {int(row): loc for row, loc in state["locations"].items()}
+
+        return store
+
+
+def chunk_record(chunk: Dict, doc: int) -> Dict:
+    """
+    Offset record for ChunkStore.append() from a chunker dict. Chunks
+    without offsets are their own document (start 0, end len(text)).
+    """
+
+    record = {
+        "doc": doc,
+        "start": chunk.get("start", 0),
+        "end": chunk.get("end", len(chunk["text"])),
+        "source": chunk["source"],
+        "chunk_id": chunk["chunk_id"],
+    }
+
+    for key in ("page", "locations"):
+        if key in chunk:
+            record[key] = chunk[key]
+
+    return record
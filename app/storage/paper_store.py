@@ -0,0 +1,306 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# "1706.03762v5" -> ("1706.03762", 5); old-style "hep-th/9901001v1" too
+_VERSIONED_ID = re.compile(r"^(?P<base>.+?)(?:v(?P<version>\d+))?$")
+
+_CATALOG = "catalog.json"
+
+
+def split_arxiv_id(arxiv_id: str):
+    """
+    Returns (base id, version or None).
+    """
+
+    match = _VERSIONED_ID.match(arxiv_id.strip())
+    version = match.group("version")
+    return match.group("base"), int(version) if version else None
+
+
+class PaperStore:
+    """
+    Local store of arXiv papers, one directory per ID and version:
+
+        <directory>/<id>v<N>/paper.pdf
+                            /paper.json      text, page map, metadata
+                            /index-<tag>/    retriever snapshots
+        <directory>/merged-<key>/            snapshot over several papers
+
+    A catalog records each paper's (and merged index's) size on disk and
+    when it was last used. Once the total exceeds `max_bytes`, least
+    recently used entries are deleted as a whole. An ID without a version resolves to
+    the newest stored version, so repeat questions need no network.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 4 << 30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._catalog: Dict[str, Dict] = self._read_catalog()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self._catalog.values())
+
+    # -----------------------------
+    # Lookup
+    # -----------------------------
+
+    def resolve(self, arxiv_id: str) -> Optional[str]:
+        """
+        Versioned ID of the stored paper for `arxiv_id`, or None.
+        """
+
+        base, version = split_arxiv_id(arxiv_id)
+
+        with self._lock:
+            if version is not None:
+                key = f"{base}v{version}"
+                found = key if key in self._catalog else None
+            else:
+                stored = [
+                    (entry["version"], key)
+                    for key, entry in self._catalog.items()
+                    if entry["arxiv_id"] == base
+                ]
+                found = max(stored)[1] if stored else None
+
+            if found is not None and not (self._paper_dir(found) / "paper.json").exists():
+                del self._catalog[found]
+                found = None
+
+            if found is not None:
+                self._catalog[found]["last_used"] = time.time()
+                self._write_catalog()
+
+        return found
+
+    def get_paper(self, key: str) -> Optional[Dict]:
+        """
+        {"arxiv_id", "version", "title", "text", "page_starts"} of a
+        stored paper, or None.
+        """
+
+        try:
+            with open(self._paper_dir(key) / "paper.json", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def pdf_path(self, key: str) -> Path:
+        return self._paper_dir(key) / "paper.pdf"
+
+    def index_path(self, key: str, tag: str) -> Path:
+        """
+        Where the retriever snapshot for this paper and chunking
+        settings tag lives. Call refresh(key) after writing it.
+        """
+        return self._paper_dir(key) / f"index-{tag}"
+
+    def merged_index_path(self, index_key: str) -> Path:
+        """
+        Where the snapshot of an index over several papers lives. Call
+        track_merged_index(index_key) after writing or opening it.
+        """
+        return self._paper_dir(f"merged-{index_key}")
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+
+    def put_paper(
+        self,
+        versioned_id: str,
+        pdf_bytes: bytes,
+        text: str,
+        page_starts: Optional[List[int]] = None,
+        title: Optional[str] = None,
+    ) -> str:
+        """
+        Stores a downloaded paper and returns its key.
+        """
+
+        base, version = split_arxiv_id(versioned_id)
+        version = version or 1
+        key = f"{base}v{version}"
+
+        paper_dir = self._paper_dir(key)
+        paper_dir.mkdir(parents=True, exist_ok=True)
+
+        _write_atomic(paper_dir / "paper.pdf", pdf_bytes)
+        _write_atomic(
+            paper_dir / "paper.json",
+            json.dumps(
+                {
+                    "arxiv_id": base,
+                    "version": version,
+                    "title": title,
+                    "text": text,
+                    "page_starts": page_starts,
+                },
+                ensure_ascii=False,
+            ).encode("utf-8"),
+        )
+
+        with self._lock:
+            self._catalog[key] = {
+                "arxiv_id": base,
+                "version": version,
+                "bytes": _directory_bytes(paper_dir),
+                "last_used": time.time(),
+            }
+            self._evict(keep=key)
+            self._write_catalog()
+
+        logger.info(f"Stored arXiv paper {key} in {paper_dir}")
+        return key
+
+    def refresh(self, key: str) -> None:
+        """
+        Re-measures a paper after files (e.g. an index snapshot) were
+        added to its directory, and evicts if over budget.
+        """
+
+        with self._lock:
+            entry = self._catalog.get(key)
+            if entry is None:
+                return
+
+            entry["bytes"] = _directory_bytes(self._paper_dir(key))
+            entry["last_used"] = time.time()
+            self._evict(keep=key)
+            self._write_catalog()
+
+    def track_merged_index(self, index_key: str) -> None:
+        """
+        Counts a merged index snapshot against the budget and marks it
+        used, evicting if over budget.
+        """
+
+        key = f"merged-{index_key}"
+        path = self._paper_dir(key)
+
+        with self._lock:
+            if not path.exists():
+                self._catalog.pop(key, None)
+                return
+
+            self._catalog[key] = {
+                "arxiv_id": None,
+                "version": None,
+                "bytes": _directory_bytes(path),
+                "last_used": time.time(),
+            }
+            self._evict(keep=key)
+            self._write_catalog()
+
+    def _evict(self, keep: str) -> None:
+        """
+        Deletes least recently used papers until within budget, never
+        `keep`. Caller holds the lock.
+        """
+
+        total = self.total_bytes
+        oldest_first = sorted(self._catalog, key=lambda key: self._catalog[key]["last_used"])
+
+        for key in oldest_first:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+
+            total -= self._catalog.pop(key)["bytes"]
+            shutil.rmtree(self._paper_dir(key), ignore_errors=True)
+
+            logger.info(f"Evicted {key} from the local arXiv store")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "papers": sum(1 for entry in self._catalog.values() if entry["arxiv_id"]),
+                "merged_indexes": sum(1 for entry in self._catalog.values() if not entry["arxiv_id"]),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    # -----------------------------
+    # Catalog
+    # -----------------------------
+
+    def _paper_dir(self, key: str) -> Path:
+        return self.directory / key.replace("/", "_")
+
+    def _read_catalog(self) -> Dict[str, Dict]:
+        try:
+            with open(self.directory / _CATALOG, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_catalog(self) -> None:
+        """
+        Caller holds the lock.
+        """
+        try:
+            _write_atomic(
+                self.directory / _CATALOG,
+                json.dumps(self._catalog).encode("utf-8")
+            )
+        except OSError as e:
+            logger.warning(f"Could not write paper store catalog: {e}")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _directory_bytes(directory: Path) -> int:
+    return sum(
+        path.stat().st_size
+        for path in directory.rglob("*")
+        if path.is_file()
+    )
+
+
+@lru_cache(maxsize=None)
+def _shared_store(directory: str, max_bytes: int) -> PaperStore:
+    return PaperStore(directory, max_bytes)
+
+
+def get_paper_store(config: Optional[Dict] = None) -> Optional[PaperStore]:
+    """
+    Returns the process-wide store for this directory, or None when the
+    store is disabled.
+    """
+
+    config = config or {}
+    if not config.get("enabled", False):
+        return None
+
+    return _shared_store(
+        str(config.get("directory", "data/arxiv")),
+        int(config.get("max_size_mb", 4096)) * 2**20,
+    )
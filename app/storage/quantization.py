@@ -0,0 +1,283 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils.logger import get_logger
+from app.exceptions import StorageException
+
+logger = get_logger(__name__)
+
+_SCORE_BLOCK = 16384
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension affine int8 quantization (1 byte per component).
+
+    x ~= codes * scale + offset, so a query scores against codes
+    asymmetrically as (q * scale) . codes + q . offset without decoding.
+    """
+
+    kind = "int8"
+
+    def __init__(self, scale: Optional[np.ndarray] = None, offset: Optional[np.ndarray] = None):
+        self.scale = scale
+        self.offset = offset
+
+    def train(self, vectors: np.ndarray) -> None:
+        vmin = vectors.min(axis=0)
+        vmax = vectors.max(axis=0)
+
+        self.scale = np.maximum((vmax - vmin) / 255.0, 1e-8).astype(np.float32)
+        self.offset = (vmin + 128.0 * self.scale).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def code_size(self, dim: int) -> int:
+        return dim
+
+    def inner_products(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        scaled_query = query * self.scale
+        bias = float(query @ self.offset)
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SCORE_BLOCK):
+            block = codes[start:start + _SCORE_BLOCK].astype(np.float32)
+            scores[start:start + len(block)] = block @ scaled_query + bias
+
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"scale": self.scale, "offset": self.offset}
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `subspaces` slices,
+    each replaced by the uint8 id of its nearest sub-centroid.
+
+    Queries use asymmetric distance computation: one (subspaces, 256)
+    lookup table of q_j . c_jk per query, then a gather-and-sum per row.
+    """
+
+    kind = "pq"
+
+    def __init__(
+        self,
+        subspaces: int = 48,
+        kmeans_iters: int = 15,
+        train_sample_size: int = 65536,
+        centroids: Optional[np.ndarray] = None,
+        seed: int = 0,
+    ):
+        self.subspaces = subspaces
+        self.kmeans_iters = kmeans_iters
+        self.train_sample_size = train_sample_size
+        self.centroids = centroids
+        self.seed = seed
+
+    def train(self, vectors: np.ndarray) -> None:
+        n, dim = vectors.shape
+
+        if dim % self.subspaces:
+            raise StorageException(
+                message=(
+                    f"Embedding dim {dim} is not divisible by "
+                    f"{self.subspaces} PQ subspaces"
+                ),
+                error_code="PQ_INVALID_SUBSPACES"
+            )
+
+        rng = np.random.default_rng(self.seed)
+
+        if n > self.train_sample_size:
+            vectors = vectors[rng.choice(n, self.train_sample_size, replace=False)]
+
+        ksub = min(256, len(vectors))
+        dsub = dim // self.subspaces
+
+        self.centroids = np.zeros((self.subspaces, 256, dsub), dtype=np.float32)
+
+        for j in range(self.subspaces):
+            sub = np.ascontiguousarray(vectors[:, j * dsub:(j + 1) * dsub])
+            self.centroids[j, :ksub] = _kmeans(sub, ksub, self.kmeans_iters, rng)
+
+            # Unused code slots can never be nearest
+            self.centroids[j, ksub:] = np.inf
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        dsub = self.centroids.shape[2]
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+
+        for j in range(self.subspaces):
+            sub = vectors[:, j * dsub:(j + 1) * dsub]
+            codes[:, j] = _nearest(sub, self.centroids[j])
+
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.centroids[j][codes[:, j]] for j in range(self.subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def code_size(self, dim: int) -> int:
+        return self.subspaces
+
+    def inner_products(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        dsub = self.centroids.shape[2]
+        finite = np.where(np.isfinite(self.centroids), self.centroids, 0.0)
+
+        lookup = np.einsum("jkd,jd->jk", finite, query.reshape(self.subspaces, dsub))
+
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.subspaces):
+            scores += lookup[j][codes[:, j]]
+
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+
+def build_quantizer(config: Optional[Dict]):
+    """
+    Returns an untrained quantizer for the `quantization` config block,
+    or None when quantization is disabled.
+    """
+
+    config = config or {}
+    kind = config.get("type", "none")
+
+    if kind in (None, "none"):
+        return None
+
+    if kind == "int8":
+        return ScalarQuantizer()
+
+    if kind == "pq":
+        return ProductQuantizer(
+            subspaces=config.get("pq_subspaces", 48),
+            kmeans_iters=config.get("pq_kmeans_iters", 15),
+        )
+
+    raise StorageException(
+        message=f"Unknown quantization type: {kind}",
+        error_code="QUANTIZATION_UNKNOWN"
+    )
+
+
+def restore_quantizer(kind: str, state: Dict[str, np.ndarray]):
+    if kind == "int8":
+        return ScalarQuantizer(scale=state["scale"], offset=state["offset"])
+
+    if kind == "pq":
+        centroids = state["centroids"]
+        return ProductQuantizer(subspaces=len(centroids), centroids=centroids)
+
+    raise StorageException(
+        message=f"Unknown quantization type in snapshot: {kind}",
+        error_code="QUANTIZATION_UNKNOWN"
+    )
+
+
+# -----------------------------
+# Evaluation
+# -----------------------------
+
+def evaluate_quantization(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    settings: List[Dict],
+    top_k: int = 10,
+) -> List[Dict]:
+    """
+    Measures per-chunk memory and recall@k of each quantization setting
+    against exact float search over the same vectors.
+
+    Each entry in `settings` is a `quantization` config block, e.g.
+    {"type": "int8"}, {"type": "int8", "rescore": True} or
+    {"type": "pq", "pq_subspaces": 48}.
+    """
+
+    from app.storage.vector_store import VectorStore
+
+    dim = vectors.shape[1]
+    exact = VectorStore(dim)
+    exact.add(vectors, [{}] * len(vectors))
+
+    truth = [set(exact.search_ids(q, top_k)[0].tolist()) for q in queries]
+
+    report = []
+
+    for setting in settings:
+        store = VectorStore(dim, quantization_config=setting)
+        store.add(vectors, [{}] * len(vectors))
+        store.quantize()
+
+        hits = sum(
+            len(truth[i] & set(store.search_ids(q, top_k)[0].tolist()))
+            for i, q in enumerate(queries)
+        )
+
+        stats = store.memory_stats()
+        result = {
+            "setting": setting,
+            "bytes_per_chunk": stats["bytes_per_chunk"],
+            f"recall@{top_k}": hits / (len(queries) * top_k),
+        }
+        report.append(result)
+
+        logger.info(f"Quantization eval: {result}")
+
+    return report
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Nearest centroid by L2: argmax of x.c - |c|^2 / 2.
+    """
+
+    finite = np.isfinite(centroids[:, 0])
+    half_norms = np.full(len(centroids), np.inf, dtype=np.float32)
+    half_norms[finite] = 0.5 * np.einsum("kd,kd->k", centroids[finite], centroids[finite])
+
+    safe = np.where(np.isfinite(centroids), centroids, 0.0)
+
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _SCORE_BLOCK):
+        block = vectors[start:start + _SCORE_BLOCK]
+        assignments[start:start + len(block)] = np.argmax(
+            block @ safe.T - half_norms, axis=1
+        )
+
+    return assignments
+
+
+def _kmeans(
+    sample: np.ndarray,
+    k: int,
+    iters: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+
+    for _ in range(iters):
+        assignments = _nearest(sample, centroids)
+        counts = np.bincount(assignments, minlength=k)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty))]
+
+    return centroids
@@ -0,0 +1,288 @@
+import threading
+import weakref
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RetrieverHandle:
+    """
+    Session-side reference to a retriever owned by a RetrieverRegistry.
+
+    The reference is released when release() is called or when the
+    handle is garbage collected (e.g. its Streamlit session ends).
+    """
+
+    __slots__ = ("fingerprint", "retriever", "_finalizer", "__weakref__")
+
+    def __init__(self, registry: "RetrieverRegistry", fingerprint: str, retriever):
+        self.fingerprint = fingerprint
+        self.retriever = retriever
+        self._finalizer = weakref.finalize(self, registry._release_later, fingerprint)
+
+    def retrieve(self, query: str, top_k: int = 5, **kwargs):
+        return self.retriever.retrieve(query, top_k=top_k, **kwargs)
+
+    def release(self) -> None:
+        self._finalizer()
+
+    def _detach(self) -> None:
+        """
+        Hands the reference over without decrementing it.
+        """
+        self._finalizer.detach()
+
+
+class _Entry:
+
+    __slots__ = ("retriever", "refcount", "size_bytes")
+
+    def __init__(self, retriever, size_bytes: int):
+        self.retriever = retriever
+        self.refcount = 0
+        self.size_bytes = size_bytes
+
+
+class RetrieverRegistry:
+    """
+    Process-wide map of corpus fingerprint -> shared DocumentRetriever.
+
+    Sessions asking about the same corpus (an arXiv ID, or the same set of
+    uploaded files) share one index. Entries are reference counted, and
+    unreferenced entries are evicted least-recently-used first once the
+    total estimated size exceeds `memory_budget_bytes`.
+
+    A retriever marked stale (e.g. its ingestion failed part way) is not
+    handed out again as is: the next acquire() repairs it with `update`,
+    or rebuilds it with `builder` when no update is given.
+    """
+
+    def __init__(self, memory_budget_bytes: int):
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._building: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+        # Releases from handle finalizers may run inside a GC pass while
+        # the lock is held, so they are queued and applied under the lock.
+        self._released: deque = deque()
+
+        # Retrievers whose contents no longer match their fingerprint
+        self._stale: "weakref.WeakSet" = weakref.WeakSet()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._drain_releases()
+            return {
+                "entries": len(self._entries),
+                "referenced": sum(1 for e in self._entries.values() if e.refcount),
+                "total_bytes": self.total_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+    # -----------------------------
+    # Acquire / release
+    # -----------------------------
+
+    def acquire(
+        self,
+        fingerprint: str,
+        builder: Callable[[], object],
+        previous: Optional[RetrieverHandle] = None,
+        update: Optional[Callable[[object], None]] = None,
+    ) -> RetrieverHandle:
+        """
+        Returns a handle to the retriever for `fingerprint`.
+
+        If `previous` is the only reference to its retriever and `update`
+        is given, that retriever is updated in place and re-keyed instead
+        of building a new one. Otherwise `builder()` runs once per
+        fingerprint, even when several sessions ask concurrently.
+        `previous` is released either way.
+        """
+
+        if (
+            previous is not None
+            and previous.fingerprint == fingerprint
+            and previous.retriever not in self._stale
+        ):
+            with self._lock:
+                entry = self._entries.get(fingerprint)
+                if entry is None or entry.retriever is previous.retriever:
+                    return previous
+
+        while True:
+            with self._lock:
+                self._drain_releases()
+                entry = self._entries.get(fingerprint)
+                if entry is not None and entry.retriever not in self._stale:
+                    return self._checkout(fingerprint, entry, previous)
+
+                pending = self._building.get(fingerprint)
+                if pending is None:
+                    self._building[fingerprint] = threading.Event()
+                    retriever = None
+                    repairing = False
+
+                    if entry is not None and update is not None:
+                        # Stale: repaired in place for every session sharing it
+                        retriever = entry.retriever
+                        self._stale.discard(retriever)
+                        repairing = True
+
+                    elif previous is not None and update is not None:
+                        owned = self._entries.get(previous.fingerprint)
+                        if owned is not None and owned.refcount == 1:
+                            del self._entries[previous.fingerprint]
+                            previous._detach()
+                            retriever = owned.retriever
+                            previous = None
+                    break
+
+            # Another session is building this corpus; wait and re-check
+            pending.wait()
+
+        try:
+            if retriever is None:
+                logger.info(f"Building shared retriever for {fingerprint}")
+                retriever = builder()
+            elif repairing:
+                logger.info(f"Repairing stale retriever {fingerprint}")
+                update(retriever)
+            else:
+                logger.info(f"Updating exclusively held retriever to {fingerprint}")
+                update(retriever)
+        except BaseException:
+            if repairing:
+                self.mark_stale(retriever)
+            raise
+        finally:
+            with self._lock:
+                event = self._building.pop(fingerprint, None)
+            if event is not None:
+                event.set()
+
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = _Entry(retriever, _estimate_bytes(retriever))
+                self._entries[fingerprint] = entry
+            elif entry.retriever is not retriever:
+                # Rebuilt to replace a stale retriever
+                entry.retriever = retriever
+                entry.size_bytes = _estimate_bytes(retriever)
+
+            handle = self._checkout(fingerprint, entry, previous)
+            self._evict()
+
+        return handle
+
+    def refresh(self, retriever) -> None:
+        """
+        Re-estimates the size of `retriever` after it grew in the
+        background (e.g. a streaming ingest finished) and evicts if the
+        registry is now over budget.
+        """
+
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.retriever is retriever:
+                    entry.size_bytes = _estimate_bytes(retriever)
+            self._evict()
+
+    def mark_stale(self, retriever) -> None:
+        """
+        Flags `retriever` as not matching its fingerprint any more, so
+        the next acquire() repairs or rebuilds it.
+        """
+
+        with self._lock:
+            self._stale.add(retriever)
+
+        logger.warning("Marked shared retriever stale; it is rebuilt on next use")
+
+    def release(self, fingerprint: str) -> None:
+        self._release_later(fingerprint)
+        with self._lock:
+            self._drain_releases()
+
+    def _release_later(self, fingerprint: str) -> None:
+        self._released.append(fingerprint)
+
+    def _drain_releases(self) -> None:
+        """
+        Applies queued releases. Caller holds the lock.
+        """
+
+        if not self._released:
+            return
+
+        while self._released:
+            entry = self._entries.get(self._released.popleft())
+            if entry is not None:
+                entry.refcount = max(entry.refcount - 1, 0)
+
+        self._evict()
+
+    def _checkout(
+        self,
+        fingerprint: str,
+        entry: _Entry,
+        previous: Optional[RetrieverHandle],
+    ) -> RetrieverHandle:
+        """
+        Caller holds the lock.
+        """
+
+        entry.refcount += 1
+        self._entries.move_to_end(fingerprint)
+
+        if previous is not None:
+            previous._detach()
+            old = self._entries.get(previous.fingerprint)
+            if old is not None:
+                old.refcount = max(old.refcount - 1, 0)
+
+        return RetrieverHandle(self, fingerprint, entry.retriever)
+
+    def _evict(self) -> None:
+        """
+        Drops unreferenced entries, oldest first, until within budget.
+        Caller holds the lock.
+        """
+
+        total = self.total_bytes
+
+        for fingerprint in list(self._entries):
+            if total <= self.memory_budget_bytes:
+                break
+
+            entry = self._entries[fingerprint]
+            if entry.refcount:
+                continue
+
+            del self._entries[fingerprint]
+            total -= entry.size_bytes
+            logger.info(
+                f"Evicted retriever {fingerprint} "
+                f"({entry.size_bytes / 2**20:.1f} MiB)"
+            )
+
+        if total > self.memory_budget_bytes:
+            logger.warning(
+                f"Retriever registry over budget: {total / 2**20:.1f} MiB "
+                f"held by active sessions"
+            )
+
+
+def _estimate_bytes(retriever) -> int:
+    memory_bytes = getattr(retriever, "memory_bytes", None)
+    return memory_bytes() if memory_bytes else 0
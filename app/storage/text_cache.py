@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bumped whenever extraction changes, so stale entries read as misses
+EXTRACTION_VERSION = 1
+
+
+class TextCache:
+    """
+    On-disk cache of extracted document text and page maps, keyed by the
+    SHA-256 of the source file's bytes.
+
+    Each entry is one JSON file ({"text", "page_starts"}) written
+    atomically. Reads refresh the file's mtime, and once the total size
+    exceeds `max_bytes` the least recently used entries are deleted.
+    Shared by the upload loader and the arXiv fetcher.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {
+            path.stem: path.stat().st_size
+            for path in self.directory.glob("*.json")
+        }
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    # -----------------------------
+    # Entries
+    # -----------------------------
+
+    def get(self, digest: str) -> Optional[Dict]:
+        """
+        Returns {"text", "page_starts"} for the file with this SHA-256,
+        or None on a miss.
+        """
+
+        path = self._path(digest)
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is None or entry.get("version") != EXTRACTION_VERSION:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+
+        logger.info(f"Text cache hit for {digest[:12]}")
+        return {"text": entry["text"], "page_starts": entry.get("page_starts")}
+
+    def put(self, digest: str, text: str, page_starts: Optional[List[int]] = None) -> None:
+        path = self._path(digest)
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": EXTRACTION_VERSION,
+                        "text": text,
+                        "page_starts": page_starts,
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, path)
+            size = path.stat().st_size
+        except OSError as e:
+            logger.warning(f"Could not cache extracted text for {digest[:12]}: {e}")
+            return
+
+        with self._lock:
+            self._sizes[digest] = size
+            self._evict()
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.json"
+
+    def _evict(self) -> None:
+        """
+        Deletes least recently read entries until within budget.
+        Caller holds the lock.
+        """
+
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+
+        def last_used(digest: str) -> float:
+            try:
+                return self._path(digest).stat().st_mtime
+            except OSError:
+                return 0.0
+
+        for digest in sorted(self._sizes, key=last_used):
+            if total <= self.max_bytes:
+                break
+
+            total -= self._sizes.pop(digest)
+            try:
+                self._path(digest).unlink()
+            except OSError:
+                pass
+
+            logger.info(f"Evicted cached text {digest[:12]}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._sizes),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def _shared_cache(directory: str, max_bytes: int) -> TextCache:
+    return TextCache(directory, max_bytes)
+
+
+def get_text_cache(config: Optional[Dict] = None) -> Optional[TextCache]:
+    """
+    Returns the process-wide cache for this directory, or None when the
+    cache is disabled.
+    """
+
+    config = config or {}
+    if not config.get("enabled", False):
+        return None
+
+    return _shared_cache(
+        str(config.get("directory", "data/cache/text")),
+        int(config.get("max_size_mb", 1024)) * 2**20,
+    )
@@ -0,0 +1,618 @@
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.utils.logger import get_logger
+from app.exceptions import StorageException
+from app.storage.ann_index import IVFFlatIndex
+from app.storage.quantization import build_quantizer, restore_quantizer
+
+logger = get_logger(__name__)
+
+
+class VectorStore:
+    """
+    In-memory dense vector index.
+
+    Embeddings live in one contiguous float32 matrix with L2-normalized
+    rows, so cosine similarity is a single matrix-vector product.
+
+    `index_config` selects the search engine:
+        engine: "auto" | "brute_force" | "ivf_flat"
+        ann_threshold: row count above which "auto" switches to IVF
+        nlist, nprobe, kmeans_iters, train_sample_size: IVF knobs
+
+    The IVF index is never trained on the query path: owners call
+    build_index() (or prepare/train/install_index() to train outside
+    their lock) after adding rows, and snapshots carry it. Until then
+    searches scan exactly.
+
+    `quantization_config` optionally compresses stored rows:
+        type: "none" | "int8" | "pq"
+        pq_subspaces: bytes per row for PQ (must divide the dim)
+        train_min_rows: rows buffered as float before training
+        rescore: also keep the float rows and re-rank the top candidates
+            exactly; better recall, but the codes then add to the float
+            memory instead of replacing it (off by default)
+        rescore_factor: candidates re-ranked per requested result
+    """
+
+    def __init__(
+        self,
+        embedding_dim: int,
+        initial_capacity: int = 1024,
+        index_config: Optional[Dict] = None,
+        quantization_config: Optional[Dict] = None,
+    ):
+        self.embedding_dim = embedding_dim
+
+        # None once rows are added without metadata (the caller keeps
+        # its own row-aligned records and only uses search_ids)
+        self.metadatas: Optional[List[Dict]] = []
+
+        self.index_config = index_config or {}
+        self.engine = self.index_config.get("engine", "auto")
+        self.ann_threshold = self.index_config.get("ann_threshold", 50000)
+        self._ann: Optional[IVFFlatIndex] = None
+
+        # Bumped by compact(), which renumbers rows under any index
+        # being trained
+        self._generation = 0
+
+        if self.engine not in ("auto", "brute_force", "ivf_flat"):
+            raise StorageException(
+                message=f"Unknown vector index engine: {self.engine}",
+                error_code="VECTOR_ENGINE_UNKNOWN"
+            )
+
+        self.quantization_config = quantization_config or {}
+        self.rescore = self.quantization_config.get("rescore", False)
+        self.rescore_factor = self.quantization_config.get("rescore_factor", 4)
+        self.train_min_rows = self.quantization_config.get("train_min_rows", 1000)
+
+        # Untrained until enough rows arrive; then codes replace floats
+        self._pending_quantizer = build_quantizer(self.quantization_config)
+        self._quantizer = None
+        self._codes: Optional[np.ndarray] = None
+
+        self._vectors: Optional[np.ndarray] = np.empty(
+            (initial_capacity, embedding_dim), dtype=np.float32
+        )
+        self._size = 0
+
+        # Tombstones for removed rows; allocated on first delete()
+        self._deleted: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def deleted_count(self) -> int:
+        return 0 if self._deleted is None else int(self._deleted[:self._size].sum())
+
+    @property
+    def live_rows(self) -> np.ndarray:
+        if self._deleted is None:
+            return np.arange(self._size)
+        return np.flatnonzero(~self._deleted[:self._size])
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """
+        Live (n, dim) float rows. Reconstructed from codes when the
+        store is quantized without keeping float rows.
+        """
+        if self._vectors is None:
+            return self._quantizer.decode(self._codes[:self._size])
+        return self._vectors[:self._size]
+
+    # -----------------------------
+    # Indexing
+    # -----------------------------
+
+    def add(self, embeddings, metadatas: Optional[List[Dict]] = None) -> None:
+        """
+        Appends a batch of embeddings with their metadata, or without any
+        if `metadatas` is None. Accepts any (n, dim) array-like; no
+        per-row Python conversion.
+        """
+
+        matrix = np.array(self._as_matrix(embeddings), dtype=np.float32)
+        _normalize_rows(matrix)
+
+        if metadatas is not None and len(matrix) != len(metadatas):
+            raise StorageException(
+                message=(
+                    f"Got {len(matrix)} embeddings for "
+                    f"{len(metadatas)} metadata entries"
+                ),
+                error_code="VECTOR_METADATA_MISMATCH"
+            )
+
+        if self._size and (metadatas is None) != (self.metadatas is None):
+            raise StorageException(
+                message="Cannot mix rows with and without metadata",
+                error_code="VECTOR_METADATA_MISMATCH"
+            )
+
+        self._reserve(self._size + len(matrix))
+
+        end = self._size + len(matrix)
+
+        if self._vectors is not None:
+            self._vectors[self._size:end] = matrix
+
+        if self._quantizer is not None:
+            self._codes[self._size:end] = self._quantizer.encode(matrix)
+
+        if self._ann is not None:
+            self._ann.add(matrix, start_row=self._size)
+
+        if self._deleted is not None:
+            self._deleted = np.concatenate(
+                (self._deleted, np.zeros(len(matrix), dtype=bool))
+            )
+
+        self._size = end
+
+        if metadatas is None:
+            self.metadatas = None
+        else:
+            if self.metadatas is None:
+                self.metadatas = []
+            self.metadatas.extend(metadatas)
+
+        logger.info(f"Added {len(matrix)} vectors (total {self._size})")
+
+        if self._pending_quantizer is not None and self._size >= self.train_min_rows:
+            self.quantize()
+
+    def delete(self, rows: np.ndarray) -> None:
+        """
+        Tombstones rows so they no longer appear in search results.
+        Storage is reclaimed by compact().
+        """
+
+        if self._deleted is None:
+            self._deleted = np.zeros(self._size, dtype=bool)
+
+        self._deleted[np.asarray(rows, dtype=np.int64)] = True
+
+    def compact(self, keep: np.ndarray) -> None:
+        """
+        Keeps only the rows in `keep` (sorted row ids), renumbering them
+        0..len(keep)-1. The ANN index is dropped until the next
+        build_index().
+        """
+
+        keep = np.asarray(keep, dtype=np.int64)
+
+        if self._vectors is not None:
+            self._vectors = np.ascontiguousarray(self._vectors[keep])
+
+        if self._codes is not None:
+            self._codes = np.ascontiguousarray(self._codes[keep])
+
+        if self.metadatas is not None:
+            self.metadatas = [self.metadatas[i] for i in keep]
+        self._size = len(keep)
+        self._deleted = None
+        self._ann = None
+        self._generation += 1
+
+        logger.info(f"Compacted vector store to {self._size} rows")
+
+    def quantize(self) -> None:
+        """
+        Trains the configured quantizer on the stored rows and encodes
+        them. Float rows are dropped unless `rescore` is enabled.
+        """
+
+        quantizer = self._pending_quantizer
+        if quantizer is None or self._size == 0:
+            return
+
+        rows = self.vectors
+        quantizer.train(rows)
+
+        codes = quantizer.encode(rows)
+        self._codes = np.empty(
+            (len(self._vectors), codes.shape[1]), dtype=codes.dtype
+        )
+        self._codes[:self._size] = codes
+
+        self._quantizer = quantizer
+        self._pending_quantizer = None
+
+        if not self.rescore:
+            self._vectors = None
+
+        logger.info(
+            f"Quantized {self._size} vectors with {quantizer.kind} "
+            f"({codes.shape[1]} bytes/row)"
+        )
+
+    def _reserve(self, capacity: int) -> None:
+        current = len(self._codes if self._vectors is None else self._vectors)
+        if capacity <= current:
+            return
+
+        new_capacity = max(capacity, 2 * current, 1024)
+
+        if self._vectors is not None:
+            grown = np.empty((new_capacity, self.embedding_dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+
+        if self._codes is not None:
+            grown = np.empty((new_capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+            grown[:self._size] = self._codes[:self._size]
+            self._codes = grown
+
+    def _as_matrix(self, embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+
+        if matrix.ndim != 2 or matrix.shape[1] != self.embedding_dim:
+            raise StorageException(
+                message=(
+                    f"Expected embeddings of dim {self.embedding_dim}, "
+                    f"got shape {matrix.shape}"
+                ),
+                error_code="VECTOR_DIM_MISMATCH"
+            )
+
+        return matrix
+
+    def memory_stats(self) -> Dict:
+        """
+        Bytes held per stored row. Memory-mapped float rows are reported
+        separately since they are paged in on demand.
+        """
+
+        float_bytes = 0 if self._vectors is None else self._size * self.embedding_dim * 4
+        code_bytes = 0 if self._codes is None else self._codes[:self._size].nbytes
+        float_mapped = isinstance(self._vectors, np.memmap)
+
+        resident = code_bytes + (0 if float_mapped else float_bytes)
+
+        return {
+            "rows": self._size,
+            "quantization": self._quantizer.kind if self._quantizer else "none",
+            "float_bytes": float_bytes,
+            "code_bytes": code_bytes,
+            "float_mapped": float_mapped,
+            "bytes_per_chunk": resident / self._size if self._size else 0.0,
+        }
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def save(self, directory: Path) -> None:
+        """
+        Writes `vectors.npy` (when float rows are kept), `codes.npy` plus
+        `quantizer.npz` for quantized stores and `ann.npz` when an IVF
+        index is built. Metadata is persisted by the owning retriever.
+        """
+
+        directory = Path(directory)
+
+        if self._vectors is not None:
+            np.save(directory / "vectors.npy", self._vectors[:self._size])
+
+        if self._quantizer is not None:
+            np.save(directory / "codes.npy", self._codes[:self._size])
+            np.savez(
+                directory / "quantizer.npz",
+                kind=np.array(self._quantizer.kind),
+                **self._quantizer.state()
+            )
+
+        if self._ann is not None:
+            np.savez(directory / "ann.npz", **self._ann.state())
+
+    @classmethod
+    def load(
+        cls,
+        directory: Path,
+        metadatas: Optional[List[Dict]],
+        index_config: Optional[Dict] = None,
+        quantization_config: Optional[Dict] = None,
+        mmap: bool = True,
+    ) -> "VectorStore":
+        """
+        Opens the snapshot arrays memory-mapped (read-only) by default, so
+        worker processes serving the same snapshot share pages via the OS
+        cache. The first add() after loading copies the rows into memory.
+        A saved IVF index is reopened as is; one is only trained here for
+        snapshots written without it.
+        """
+
+        directory = Path(directory)
+        mmap_mode = "r" if mmap else None
+
+        vectors = codes = quantizer = ann_state = None
+
+        try:
+            if (directory / "vectors.npy").exists():
+                vectors = np.load(directory / "vectors.npy", mmap_mode=mmap_mode)
+
+            if (directory / "codes.npy").exists():
+                codes = np.load(directory / "codes.npy", mmap_mode=mmap_mode)
+                with np.load(directory / "quantizer.npz") as state:
+                    quantizer = restore_quantizer(
+                        str(state["kind"]),
+                        {k: state[k] for k in state.files if k != "kind"}
+                    )
+
+            if (directory / "ann.npz").exists():
+                with np.load(directory / "ann.npz") as state:
+                    ann_state = {k: state[k] for k in state.files}
+        except (OSError, ValueError) as e:
+            raise StorageException(
+                message=f"Failed to load vectors from {directory}",
+                error_code="VECTOR_LOAD_FAILED"
+            ) from e
+
+        stored = vectors if vectors is not None else codes
+
+        if stored is None:
+            raise StorageException(
+                message=f"No vectors or codes found in {directory}",
+                error_code="VECTOR_LOAD_FAILED"
+            )
+
+        if metadatas is not None and len(stored) != len(metadatas):
+            raise StorageException(
+                message=(
+                    f"Snapshot has {len(stored)} vectors for "
+                    f"{len(metadatas)} metadata entries"
+                ),
+                error_code="VECTOR_METADATA_MISMATCH"
+            )
+
+        if vectors is not None:
+            embedding_dim = vectors.shape[1]
+        elif quantizer.kind == "int8":
+            embedding_dim = codes.shape[1]
+        else:
+            embedding_dim = quantizer.centroids.shape[0] * quantizer.centroids.shape[2]
+
+        store = cls(
+            embedding_dim=embedding_dim,
+            initial_capacity=0,
+            index_config=index_config,
+            quantization_config=quantization_config,
+        )
+        store._vectors = vectors
+        store._size = len(stored)
+        store.metadatas = None if metadatas is None else list(metadatas)
+
+        if quantizer is not None:
+            store._codes = codes
+            store._quantizer = quantizer
+            store._pending_quantizer = None
+
+        if store._use_ann():
+            if ann_state is not None:
+                store._ann = IVFFlatIndex.restore(
+                    ann_state, nprobe=store.index_config.get("nprobe", 8)
+                )
+            else:
+                store.build_index()
+
+        return store
+
+    # -----------------------------
+    # ANN engine
+    # -----------------------------
+
+    def _use_ann(self) -> bool:
+        if self.engine == "ivf_flat":
+            return self._size > 0
+        if self.engine == "auto":
+            return self._size >= self.ann_threshold
+        return False
+
+    def _active_ann(self) -> Optional[IVFFlatIndex]:
+        return self._ann if self._use_ann() else None
+
+    def build_index(self) -> None:
+        """
+        Trains the IVF index when it is missing or stale. Rows appended
+        after a build are assigned to existing lists until they outnumber
+        the indexed rows, at which point the centroids are retrained.
+        """
+
+        pending = self.prepare_index()
+        if pending is not None:
+            rows, generation = pending
+            self.install_index(self.train_index(rows), generation)
+
+    def prepare_index(self) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        Returns (rows, generation) to train a new IVF index on, or None
+        when the current one is fine. The rows are never modified before
+        the next compact(), so train_index() may run without the
+        caller's lock.
+        """
+
+        if not self._use_ann():
+            self._ann = None
+            return None
+
+        ann = self._ann
+        if ann is not None and ann.pending_count <= ann.indexed_count:
+            return None
+
+        return self.vectors, self._generation
+
+    def train_index(self, rows: np.ndarray) -> IVFFlatIndex:
+        ann = IVFFlatIndex(
+            nlist=self.index_config.get("nlist"),
+            nprobe=self.index_config.get("nprobe", 8),
+            kmeans_iters=self.index_config.get("kmeans_iters", 10),
+            train_sample_size=self.index_config.get("train_sample_size", 65536),
+        )
+        ann.build(rows)
+        return ann
+
+    def install_index(self, ann: IVFFlatIndex, generation: int) -> bool:
+        """
+        Swaps in an index from train_index(), assigning rows appended
+        since it was prepared. Returns False (and drops it) if the store
+        was compacted in the meantime.
+        """
+
+        if generation != self._generation:
+            return False
+
+        covered = ann.indexed_count
+        if covered < self._size:
+            ann.add(self.vectors[covered:], start_row=covered)
+
+        self._ann = ann
+        return True
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+
+    def search_ids(
+        self,
+        query_embedding,
+        top_k: int = 5,
+        rows: Optional[np.ndarray] = None,
+    ):
+        """
+        Returns (row_ids, scores) of the top_k rows, best first.
+
+        `rows` (sorted row ids) restricts the search to a subset, e.g.
+        the rows of one source. Only those rows are scored, exactly,
+        so a filtered search costs time proportional to the subset.
+        """
+
+        query = self._as_matrix(query_embedding)[0]
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        return self._search_normalized(query, top_k, rows)
+
+    def _search_normalized(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray] = None,
+    ):
+        if rows is None:
+            ann = self._active_ann()
+            rows = ann.candidates(query) if ann is not None else None
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+
+        if self._deleted is not None:
+            rows = self.live_rows if rows is None else rows[~self._deleted[rows]]
+
+        if self._quantizer is None:
+            scores = self._score_floats(query, rows)
+            best = top_k_indices(scores, top_k)
+            return _row_ids(rows, best), scores[best]
+
+        # Asymmetric distance: float query against stored codes
+        codes = self._codes[:self._size] if rows is None else self._codes[rows]
+        scores = self._quantizer.inner_products(query, codes)
+
+        if not self.rescore or self._vectors is None:
+            best = top_k_indices(scores, top_k)
+            return _row_ids(rows, best), scores[best]
+
+        # Exact re-rank of the approximate shortlist
+        shortlist = _row_ids(rows, top_k_indices(scores, top_k * self.rescore_factor))
+        shortlist.sort()
+
+        exact = self._vectors[shortlist] @ query
+        best = top_k_indices(exact, top_k)
+        return shortlist[best], exact[best]
+
+    def _score_floats(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        if rows is None:
+            return self.vectors @ query
+        return self._vectors[rows] @ query
+
+    def search(
+        self,
+        query_embedding,
+        top_k: int = 5,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Dict]:
+        """
+        Returns metadata of the top_k most similar rows.
+        """
+
+        ids, _ = self.search_ids(query_embedding, top_k=top_k, rows=rows)
+        return self._metadata_for(ids)
+
+    def search_many(self, query_embeddings, top_k: int = 5) -> List[List[Dict]]:
+        """
+        Scores a batch of queries with one (q, dim) x (dim, n) matmul.
+        """
+
+        queries = self._as_matrix(query_embeddings).copy()
+        _normalize_rows(queries)
+
+        if (
+            self._active_ann() is not None
+            or self._quantizer is not None
+            or self._deleted is not None
+        ):
+            # Candidate rows and shortlists differ per query
+            return [
+                self._metadata_for(self._search_normalized(q, top_k)[0])
+                for q in queries
+            ]
+
+        scores = queries @ self.vectors.T
+
+        return [
+            self._metadata_for(top_k_indices(row, top_k))
+            for row in scores
+        ]
+
+    def _metadata_for(self, ids: np.ndarray) -> List[Dict]:
+        if self.metadatas is None:
+            raise StorageException(
+                message="Rows were added without metadata; use search_ids()",
+                error_code="VECTOR_NO_METADATA"
+            )
+        return [self.metadatas[i] for i in ids]
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k largest scores, best first.
+    Uses argpartition so only the selected k are sorted.
+    """
+
+    n = len(scores)
+    if n == 0 or top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if top_k < n:
+        candidates = np.argpartition(scores, n - top_k)[n - top_k:]
+    else:
+        candidates = np.arange(n)
+
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def _row_ids(rows: Optional[np.ndarray], positions: np.ndarray) -> np.ndarray:
+    return positions if rows is None else rows[positions]
+
+
+def _normalize_rows(matrix: np.ndarray) -> None:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
@@ -0,0 +1,153 @@
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because
+been before being below between both but by can could did do does doing
+down during each few for from further had has have having he her here hers
+herself him himself his how i if in into is it its itself just me more most
+my myself no nor not of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would
+you your yours yourself yourselves
+""".split())
+
+# (suffix, replacement, minimum stem length), checked in order
+_LIGHT_SUFFIXES = (
+    ("ies", "y", 2),
+    ("sses", "ss", 2),
+    ("ing", "", 3),
+    ("edly", "", 3),
+    ("ed", "", 3),
+    ("ly", "", 3),
+    ("es", "e", 3),
+    ("s", "", 3),
+)
+
+
+def light_stem(token: str) -> str:
+    """
+    Strips one common English inflectional suffix. Much cheaper (and
+    less aggressive) than Porter; enough to match plurals and -ing/-ed.
+    """
+
+    if token.endswith("ss") or token.endswith("us") or token.endswith("is"):
+        return token
+
+    for suffix, replacement, min_stem in _LIGHT_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= min_stem:
+            stem = token[:-len(suffix)] + replacement
+
+            # running -> run, stopped -> stop
+            if (
+                suffix in ("ing", "ed")
+                and stem[-1] == stem[-2]
+                and stem[-1] not in "aeioulsz"
+            ):
+                stem = stem[:-1]
+
+            return stem
+
+    return token
+
+
+class TextAnalyzer:
+    """
+    Single tokenizer shared by BM25 indexing, query parsing and chat
+    relevance filtering.
+
+    Text is split by one compiled regex, optionally lowercased, stripped
+    of stopwords and light-stemmed. Tokens are sys.intern()ed, so set
+    overlap compares identical string objects.
+
+    Only texts that repeat are memoized (bounded LRU): query token
+    streams via tokens() and chat-message term sets via term_set().
+    Chunks are indexed once, through the uncached analyze(), so they
+    neither stay pinned in the cache nor evict the entries that repeat.
+    """
+
+    def __init__(
+        self,
+        lowercase: bool = True,
+        stopwords: bool = True,
+        stemming: bool = False,
+        cache_size: int = 65536,
+    ):
+        self.lowercase = lowercase
+        self.stopwords = ENGLISH_STOPWORDS if stopwords else frozenset()
+        self.stemming = stemming
+
+        self.tokens = lru_cache(maxsize=cache_size)(self.analyze)
+        self.term_set = lru_cache(maxsize=cache_size)(self._term_set)
+
+    @property
+    def settings(self) -> Dict:
+        """
+        Everything that changes the token stream; stored alongside
+        indexes built with this analyzer.
+        """
+        return {
+            "lowercase": self.lowercase,
+            "stopwords": bool(self.stopwords),
+            "stemming": self.stemming,
+        }
+
+    # -----------------------------
+    # Analysis
+    # -----------------------------
+
+    def analyze(self, text: str) -> Tuple[str, ...]:
+        if self.lowercase:
+            text = text.lower()
+
+        tokens = _TOKEN_PATTERN.findall(text)
+
+        if self.stopwords:
+            tokens = [token for token in tokens if token not in self.stopwords]
+
+        if self.stemming:
+            tokens = [light_stem(token) for token in tokens]
+
+        return tuple(sys.intern(token) for token in tokens)
+
+    def _term_set(self, text: str) -> FrozenSet[str]:
+        return frozenset(self.analyze(text))
+
+    def cache_info(self) -> Dict:
+        infos = (self.tokens.cache_info(), self.term_set.cache_info())
+        return {
+            "hits": sum(info.hits for info in infos),
+            "misses": sum(info.misses for info in infos),
+            "entries": sum(info.currsize for info in infos),
+        }
+
+
+@lru_cache(maxsize=None)
+def _shared_analyzer(
+    lowercase: bool,
+    stopwords: bool,
+    stemming: bool,
+    cache_size: int,
+) -> TextAnalyzer:
+    return TextAnalyzer(lowercase, stopwords, stemming, cache_size)
+
+
+def get_analyzer(config: Optional[Dict] = None) -> TextAnalyzer:
+    """
+    Returns the process-wide analyzer for these settings, so every
+    consumer with the same configuration shares one cache.
+    """
+
+    config = config or {}
+
+    return _shared_analyzer(
+        bool(config.get("lowercase", True)),
+        bool(config.get("stopwords", True)),
+        bool(config.get("stemming", False)),
+        int(config.get("cache_size", 65536)),
+    )
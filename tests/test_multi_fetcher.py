@@ -0,0 +1,160 @@
+"""
+Multi-paper arXiv fetching against a local stub of the arXiv API and
+PDF host; no network access needed.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from app.exceptions import RetrievalException
+from app.pipelines.arxiv_rag.multi_fetcher import (
+    ArxivClient,
+    fetch_arxiv_papers,
+    parse_arxiv_ids,
+)
+from app.storage.paper_store import PaperStore
+
+DOWNLOAD_DELAY = 0.5
+
+# base id -> (version, title); "slow" papers outlast the client timeout
+PAPERS = {
+    "2401.00001": (2, "First paper"),
+    "2401.00002": (1, "Second paper"),
+    "2401.00003": (3, "Third paper"),
+    "2401.00004": (1, "Slow paper"),
+}
+SLOW = {"2401.00004"}
+
+
+def _pdf(text: str) -> bytes:
+    doc = fitz.open()
+    for page_number in (1, 2):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{text} page {page_number}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _feed(base_url: str, ids) -> bytes:
+    entries = []
+    for arxiv_id in ids:
+        base = arxiv_id.split("v")[0]
+        if base not in PAPERS:
+            continue
+        version, title = PAPERS[base]
+        entries.append(
+            f"<entry><id>http://arxiv.org/abs/{base}v{version}</id>"
+            f"<title>{title}</title>"
+            f'<link title="pdf" href="{base_url}/pdf/{base}v{version}" rel="related"/>'
+            f"</entry>"
+        )
+    return (
+        '<feed xmlns="http://www.w3.org/2005/Atom">' + "".join(entries) + "</feed>"
+    ).encode()
+
+
+@pytest.fixture
+def stub_arxiv():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            requests_seen.append(url.path)
+            base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+            if url.path == "/api/query":
+                ids = parse_qs(url.query)["id_list"][0].split(",")
+                body = _feed(base_url, ids)
+                content_type = "application/atom+xml"
+            elif url.path.startswith("/pdf/"):
+                base = url.path.rsplit("/", 1)[1].split("v")[0]
+                time.sleep(DOWNLOAD_DELAY * (10 if base in SLOW else 1))
+                body = _pdf(PAPERS[base][1])
+                content_type = "application/pdf"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}", requests_seen
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_arxiv_ids():
+    assert parse_arxiv_ids("2401.00001, 2401.00002;2401.00001") == ["2401.00001", "2401.00002"]
+
+    with pytest.raises(RetrievalException):
+        parse_arxiv_ids("a b c", max_papers=2)
+
+
+def test_downloads_run_concurrently(stub_arxiv):
+    base_url, _ = stub_arxiv
+    client = ArxivClient(api_url=f"{base_url}/api/query", timeout=5, pool_size=4)
+    ids = ["2401.00001", "2401.00002", "2401.00003"]
+
+    started = time.perf_counter()
+    papers = fetch_arxiv_papers(ids, client, extract_workers=1)
+    elapsed = time.perf_counter() - started
+
+    # Serial downloads would take 3 * DOWNLOAD_DELAY
+    assert elapsed < 2 * DOWNLOAD_DELAY
+    assert papers["2401.00001"]["arxiv_id"] == "2401.00001v2"
+    assert papers["2401.00003"]["title"] == "Third paper"
+    assert "Second paper page 2" in papers["2401.00002"]["text"]
+    assert len(papers["2401.00002"]["page_starts"]) == 2
+
+
+def test_slow_and_unknown_papers_are_reported(stub_arxiv):
+    base_url, _ = stub_arxiv
+    client = ArxivClient(api_url=f"{base_url}/api/query", timeout=1.5, pool_size=4)
+
+    started = time.perf_counter()
+    papers = fetch_arxiv_papers(
+        ["2401.00001", "2401.00004", "9999.99999"], client, extract_workers=1
+    )
+    elapsed = time.perf_counter() - started
+
+    assert "text" in papers["2401.00001"]
+    assert "error" in papers["2401.00004"]
+    assert "error" in papers["9999.99999"]
+    assert elapsed < 3
+
+
+def test_stored_papers_need_no_network(stub_arxiv, tmp_path):
+    base_url, requests_seen = stub_arxiv
+    client = ArxivClient(api_url=f"{base_url}/api/query", timeout=5, pool_size=4)
+    store = PaperStore(str(tmp_path / "arxiv"))
+    ids = ["2401.00001", "2401.00002"]
+
+    first = fetch_arxiv_papers(ids, client, paper_store=store, extract_workers=1)
+    seen = len(requests_seen)
+
+    again = fetch_arxiv_papers(ids, client, paper_store=store, extract_workers=1)
+
+    assert len(requests_seen) == seen
+    assert [again[i]["text"] for i in ids] == [first[i]["text"] for i in ids]
+    assert store.resolve("2401.00001") == "2401.00001v2"